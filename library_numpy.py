@@ -0,0 +1,778 @@
+import functools
+import numpy as np
+import pandas as pd
+
+
+def _column(values):
+    """ Transforms column into a one-dimensional NumPy array.
+    
+    Columns without NULL values and with numerical or Boolean
+    values are represented as arrays with fixed-width data types.
+    Other columns (e.g., strings, tuples, or columns with NULL
+    values) are represented as arrays of Python objects where
+    None represents NULL.
+    
+    Args:
+        values: a column (NumPy array, list, or other sequence)
+    
+    Returns:
+        column as NumPy array
+    """
+    if isinstance(values, np.ndarray):
+        return values
+    if isinstance(values, memoryview):
+        return np.asarray(values)
+    if not isinstance(values, list):
+        values = list(values)
+    array = None
+    if not (values and isinstance(values[0], (str, tuple))):
+        try:
+            array = np.array(values)
+        except ValueError:
+            pass
+    if array is None or array.ndim != 1 or array.dtype.kind not in 'biuf':
+        array = np.fromiter(values, dtype=object, count=len(values))
+    return array
+
+
+def _scalar(value):
+    """ Transforms NumPy scalars into Python values.
+    
+    Args:
+        value: a NumPy scalar or a Python value
+    
+    Returns:
+        corresponding Python value
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _python_values(column):
+    """ Returns column values as list of Python objects.
+    
+    Args:
+        column: a column (NumPy array, list, or other sequence)
+    
+    Returns:
+        list with column values
+    """
+    if isinstance(column, np.ndarray):
+        return column.tolist()
+    elif isinstance(column, list):
+        return column
+    else:
+        return list(column)
+
+
+def _nulls(array):
+    """ Returns null mask for array.
+    
+    Args:
+        array: a column represented as NumPy array
+    
+    Returns:
+        Boolean array, True for NULL values, or None if no NULL values
+    """
+    if array.dtype != object:
+        return None
+    mask = np.equal(array, None)
+    return mask if mask.any() else None
+
+
+def _filled(array, mask):
+    """ Replaces NULL values to enable vectorized operations.
+    
+    Args:
+        array: a column represented as NumPy array
+        mask: null mask (True for NULL values)
+    
+    Returns:
+        copy of array with NULL values replaced by other array values
+    """
+    array = array.copy()
+    non_null = array[~mask]
+    array[mask] = non_null[0] if len(non_null) else 0
+    return array
+
+
+def _binary(column_1, column_2, operation):
+    """ Applies binary operation to two columns, propagating NULL values.
+    
+    Args:
+        column_1: first operand column
+        column_2: second operand column
+        operation: vectorized operation on NumPy arrays
+    
+    Returns:
+        result column, NULL where any of the operands is NULL
+    """
+    array_1 = _column(column_1)
+    array_2 = _column(column_2)
+    nulls_1 = _nulls(array_1)
+    nulls_2 = _nulls(array_2)
+    if nulls_1 is None and nulls_2 is None:
+        return operation(array_1, array_2)
+    
+    mask = np.zeros(len(array_1), dtype=bool)
+    if nulls_1 is not None:
+        mask |= nulls_1
+        array_1 = _filled(array_1, nulls_1)
+    if nulls_2 is not None:
+        mask |= nulls_2
+        array_2 = _filled(array_2, nulls_2)
+    result = operation(array_1, array_2).astype(object)
+    result[mask] = None
+    return result
+
+
+def _truth(column):
+    """ Determines rows where Boolean column is True.
+    
+    Args:
+        column: a column with Boolean values (None representing NULL)
+    
+    Returns:
+        Boolean array, True where column value is True
+    """
+    array = _column(column)
+    if array.dtype == bool:
+        return array
+    return np.equal(array, True)
+
+
+def load_from_csv(path_to_csv):
+    """ Loads data from a .csv file.
+    
+    Args:
+        path_to_csv: path to .csv file to load
+    
+    Returns:
+        the loaded data
+    """
+    return pd.read_csv(path_to_csv, header=None)
+
+
+def to_columnar_format(csv_data):
+    """ Transform data loaded from .csv into columnar representation.
+    
+    Args:
+        csv_data: data loaded using load_from_csv
+    
+    Returns:
+        a list of columns where each column is a NumPy array.
+    """
+    columns = []
+    for i in range(csv_data.shape[1]):
+        values = csv_data[i]
+        if values.dtype.kind not in 'biuf':
+            # NULL values of string columns are read as NaN
+            values = values.astype(object)
+            values = values.where(values.notna(), None)
+        columns += [_column(values.to_numpy())]
+    return columns
+
+
+def write_to_csv(rows, path_to_csv):
+    """ Writes rows to a .csv file.
+    
+    Args:
+        rows: write these rows into a .csv file
+        path_to_csv: path to .csv file
+    """
+    pd.DataFrame(rows).to_csv(path_to_csv, header=None, index=False)
+
+
+def to_row_format(columns):
+    """ Transforms columnar layout to row-based representation.
+    
+    Args:
+        columns: a list of columns
+    
+    Returns:
+        a list of rows where each row is a tuple of Python values
+    """
+    return list(zip(*[_python_values(c) for c in columns]))
+
+
+def normalize(raw_column):
+    """ Normalize column representation.
+    
+    Args:
+        raw_column: a column or a scalar value
+    
+    Returns:
+        a column
+    """
+    if isinstance(raw_column, (np.ndarray, list)):
+        return raw_column
+    return _column([raw_column])
+
+
+def nr_rows(column):
+    """ Returns number of rows in a column.
+    
+    Args:
+        column: a column
+    
+    Returns:
+        number of elements in column
+    """
+    return len(column)
+
+
+def get_value(column, index):
+    """ Returns value in column at given index.
+    
+    Args:
+        column: a column
+        index: item index
+    
+    Returns:
+        column value at given index (as Python value)
+    """
+    return _scalar(column[index])
+
+
+def fill_column(constant, nr_rows):
+    """ Returns a column filled with constant values.
+    
+    Args:
+        constant: a constant
+        nr_rows: number of rows in result column
+    
+    Returns:
+        a column containing constant values
+    """
+    if isinstance(constant, (bool, int, float)):
+        value = np.array(constant)
+    else:
+        value = np.empty((), dtype=object)
+        value[()] = constant
+    # read-only view, storing the constant only once
+    return np.broadcast_to(value, nr_rows)
+
+
+def map_column(column, map_fct):
+    """ Applies function to each element of the column.
+    
+    Args:
+        column: a column
+        map_fct: apply to each element in column
+    
+    Returns:
+        a column with the result of function
+    """
+    return _column([map_fct(v) for v in _python_values(column)])
+
+
+def addition(column_1, column_2):
+    """ Performs addition between two columns.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.add)
+
+
+def subtraction(column_1, column_2):
+    """ Performs subtraction between two columns.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.subtract)
+
+
+def multiplication(column_1, column_2):
+    """ Performs multiplication between two columns.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.multiply)
+
+
+def division(column_1, column_2):
+    """ Performs division between two columns.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column, NULL where any of the operands is NULL
+    """
+    def divide(array_1, array_2):
+        """ Divides arrays, raising an error for division by zero. """
+        with np.errstate(divide='raise', invalid='raise'):
+            return np.true_divide(array_1, array_2)
+    return _binary(column_1, column_2, divide)
+
+
+def cast_to_float(column):
+    """ Casts a column to float values.
+    
+    Args:
+        column: a column
+    
+    Returns:
+        a column with float values (NULL values are kept)
+    """
+    array = _column(column)
+    if _nulls(array) is None:
+        return array.astype(float)
+    return map_column(array, lambda v:None if v is None else float(v))
+
+
+def cast_to_varchar(column):
+    """ Casts a column to varchar values.
+    
+    Args:
+        column: a column
+    
+    Returns:
+        a column with varchar values (NULL values are kept)
+    """
+    return map_column(column, lambda v:None if v is None else str(v))
+
+
+def substring(column, start, length):
+    """ Extracts substring from each column row.
+    
+    Args:
+        column: a column of strings
+        start: start index of substring (count starts with 1)
+        length: length of substring
+    
+    Returns:
+        column with substrings (NULL values are kept)
+    """
+    end = start - 1 + length
+    return map_column(
+        column, lambda s:None if s is None else s[start-1:end])
+
+
+def filter_column(column, row_idx):
+    """ Filter rows in column.
+    
+    Args:
+        column: a column
+        row_idx: a column containing Booleans
+    
+    Returns:
+        values at positions where row_idx is True.
+    """
+    return _column(column)[_truth(row_idx)]
+
+
+def less_than(column_1, column_2):
+    """ True where operand_1 < operand_2.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column of Boolean values, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.less)
+
+
+def greater_than(column_1, column_2):
+    """ True where operand_1 > operand_2.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column of Boolean values, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.greater)
+
+
+def equal(column_1, column_2):
+    """ True where operand_1 = operand_2.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column of Boolean values, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.equal)
+
+
+def not_equal(column_1, column_2):
+    """ True where operand_1 <> operand_2.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column of Boolean values, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.not_equal)
+
+
+def less_than_or_equal(column_1, column_2):
+    """ True where operand_1 <= operand_2.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column of Boolean values, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.less_equal)
+
+
+def greater_than_or_equal(column_1, column_2):
+    """ True where operand_1 >= operand_2.
+    
+    Args:
+        column_1: a column
+        column_2: a column
+    
+    Returns:
+        result column of Boolean values, NULL where any of the operands is NULL
+    """
+    return _binary(column_1, column_2, np.greater_equal)
+
+
+def logical_and(columns):
+    """ Performs logical and (NULL if no operand is False but some are NULL).
+    
+    Args:
+        columns: list of columns with Boolean values
+    
+    Returns:
+        a column containing result of and
+    """
+    arrays = [_column(c) for c in columns]
+    if all(a.dtype == bool for a in arrays):
+        return np.logical_and.reduce(arrays)
+    
+    any_false = np.zeros(len(arrays[0]), dtype=bool)
+    any_null = np.zeros(len(arrays[0]), dtype=bool)
+    for array in arrays:
+        nulls = _nulls(array)
+        if nulls is not None:
+            any_null |= nulls
+            any_false |= ~(nulls | _truth(array))
+        else:
+            any_false |= ~_truth(array)
+    result = (~any_false).astype(object)
+    result[any_null & ~any_false] = None
+    return result
+
+
+def logical_or(columns):
+    """ Performs logical or (NULL if no operand is True but some are NULL).
+    
+    Args:
+        columns: list of columns with Boolean values
+    
+    Returns:
+        a column containing result of or
+    """
+    arrays = [_column(c) for c in columns]
+    if all(a.dtype == bool for a in arrays):
+        return np.logical_or.reduce(arrays)
+    
+    any_true = np.zeros(len(arrays[0]), dtype=bool)
+    any_null = np.zeros(len(arrays[0]), dtype=bool)
+    for array in arrays:
+        any_true |= _truth(array)
+        nulls = _nulls(array)
+        if nulls is not None:
+            any_null |= nulls
+    result = any_true.astype(object)
+    result[any_null & ~any_true] = None
+    return result
+
+
+def logical_not(column):
+    """ Performs logical_not on input column.
+    
+    Args:
+        column: a column with Boolean values
+    
+    Returns:
+        a column containing result of logical_not, NULL for NULL inputs
+    """
+    array = _column(column)
+    nulls = _nulls(array)
+    if nulls is None:
+        return ~_truth(array)
+    result = (~_truth(array)).astype(object)
+    result[nulls] = None
+    return result
+
+
+def rows_to_columns(rows, nr_columns):
+    """ Change from row-based to columnar layout.
+    
+    Args:
+        rows: list of rows where each row is a list
+        nr_columns: number of columns in schema
+    
+    Returns:
+        a list of columns where each column is a NumPy array
+    """
+    if not rows:
+        return [_column([]) for _ in range(nr_columns)]
+    return [_column(list(c)) for c in zip(*rows)]
+
+
+def is_null(column):
+    """ Checks if values in a column are null.
+    
+    Args:
+        column: a column
+    
+    Returns:
+        Boolean column
+    """
+    array = _column(column)
+    nulls = _nulls(array)
+    return np.zeros(len(array), dtype=bool) if nulls is None else nulls
+
+
+def calculate_sum(column):
+    """ Calculate sum of values in column.
+    
+    Args:
+        column: a column without NULL values
+    
+    Returns:
+        sum of column values
+    """
+    return _scalar(_column(column).sum())
+
+
+def calculate_min(column):
+    """ Calculate min of values in column.
+    
+    Args:
+        column: a column without NULL values
+    
+    Returns:
+        min of column values
+    """
+    return _scalar(_column(column).min())
+
+
+def calculate_max(column):
+    """ Calculate max of values in column.
+    
+    Args:
+        column: a column without NULL values
+    
+    Returns:
+        max of column values
+    """
+    return _scalar(_column(column).max())
+
+
+def calculate_avg(column):
+    """ Calculate avg of values in column.
+    
+    Args:
+        column: a column without NULL values
+    
+    Returns:
+        avg of column values
+    """
+    return calculate_sum(column) / len(column)
+
+
+def calculate_row_count(column):
+    """ Calculate row count of values in column.
+    
+    Args:
+        column: a column without NULL values
+    
+    Returns:
+        row count of column values
+    """
+    return len(column)
+
+
+def if_else(predicate_column, if_value_column, else_value_column):
+    """ Assigns if or else value, based on Boolean value.
+    
+    Args:
+        predicate_column: Boolean column with predicate evaluation result
+        if_value_column: Use values from this column if predicate is True
+        else_value_column: Use values from this column if predicate is False
+    
+    Returns:
+        column with if or else values
+    """
+    if_values = _column(if_value_column)
+    else_values = _column(else_value_column)
+    if if_values.dtype == object or else_values.dtype == object:
+        if_values = if_values.astype(object)
+        else_values = else_values.astype(object)
+    return np.where(_truth(predicate_column), if_values, else_values)
+
+
+def to_tuple_column(rows):
+    """ Transform each row into a tuple.
+    
+    Args:
+        rows: a list of rows
+    
+    Returns:
+        one column (which is a list) with tuples
+    """
+    return [tuple(row) for row in rows]
+
+
+def _per_group(agg_column, group_id_column, how):
+    """ Calculates aggregate for each group.
+    
+    Args:
+        agg_column: column with values to aggregate (no NULL values)
+        group_id_column: column containing for each row the associated group
+        how: name of pandas aggregation function
+    
+    Returns:
+        a dictionary mapping each group ID to the aggregate
+    """
+    group_ids = _column(group_id_column)
+    if group_ids.dtype != object:
+        group_ids = group_ids.astype(object)
+    codes, uniques = pd.factorize(group_ids)
+    values = pd.Series(_column(agg_column))
+    aggregates = values.groupby(codes).agg(how)
+    return dict(zip(uniques[aggregates.index], aggregates.tolist()))
+
+
+def per_group_sum(agg_column, group_id_column):
+    """ Calculate sum for each group.
+    
+    Args:
+        agg_column: column with values to sum.
+        group_id_column: column containing for each row the associated group.
+    
+    Returns:
+        a dictionary mapping each group ID to the sum
+    """
+    return _per_group(agg_column, group_id_column, 'sum')
+
+
+def per_group_min(agg_column, group_id_column):
+    """ Calculate min for each group.
+    
+    Args:
+        agg_column: column with values to min.
+        group_id_column: column containing for each row the associated group.
+    
+    Returns:
+        a dictionary mapping each group ID to the min
+    """
+    return _per_group(agg_column, group_id_column, 'min')
+
+
+def per_group_max(agg_column, group_id_column):
+    """ Calculate max for each group.
+    
+    Args:
+        agg_column: column with values to max.
+        group_id_column: column containing for each row the associated group.
+    
+    Returns:
+        a dictionary mapping each group ID to the max
+    """
+    return _per_group(agg_column, group_id_column, 'max')
+
+
+def per_group_avg(agg_column, group_id_column):
+    """ Calculate avg for each group.
+    
+    Args:
+        agg_column: column with values to avg.
+        group_id_column: column containing for each row the associated group.
+    
+    Returns:
+        a dictionary mapping each group ID to the avg
+    """
+    sums = per_group_sum(agg_column, group_id_column)
+    counts = per_group_row_count(agg_column, group_id_column)
+    return {g:sums[g] / counts[g] for g in sums}
+
+
+def per_group_row_count(column, group_id_column):
+    """ Calculate row count for each group.
+    
+    Args:
+        column: a column.
+        group_id_column: column containing for each row the associated group.
+    
+    Returns:
+        a dictionary mapping each group ID to the row count
+    """
+    return _per_group(column, group_id_column, 'size')
+
+
+def equi_join(rows_1, rows_2, eq_cols):
+    """ Performs equi-join between two input relations.
+    
+    This join implementation uses hashing on join columns.
+    
+    Example invocation:
+        join([[1, 2], [3, 4]], [[7, 2]], [(2, 2)])
+    Example output:
+        [[1, 2, 7, 2]]
+    
+    Args:
+        rows_1: rows of first relation
+        rows_2: rows of second relation
+        eq_cols: list of pairs representing columns in equality conditions
+    
+    Returns:
+        rows of join result where each row is a list
+    """
+    hash_table = {}
+    for row_2 in rows_2:
+        key = tuple([row_2[eq_col[1]] for eq_col in eq_cols])
+        hash_table.setdefault(key, []).append(list(row_2))
+    
+    result_rows = []
+    for row_1 in rows_1:
+        key = tuple([row_1[eq_col[0]] for eq_col in eq_cols])
+        if key in hash_table:
+            row_1 = list(row_1)
+            for row_2 in hash_table[key]:
+                result_rows.append(row_1 + row_2)
+    return result_rows
+
+
+def sort(rows, comparator):
+    """ Sort rows using comparator function.
+    
+    Args:
+        rows: a list of rows
+        comparator: comparator(i,j) is -1 if row i comes before row j, +1 if row j comes first, 0 if equal
+    
+    Returns:
+        sorted rows
+    """
+    return sorted(rows, key=functools.cmp_to_key(comparator))
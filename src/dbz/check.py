@@ -5,6 +5,7 @@ Created on Mar 9, 2022
 '''
 import argparse
 import dbz.engine
+import dbz.plan
 import dbz.query
 import dbz.util
 import filecmp
@@ -136,14 +137,26 @@ if __name__ == '__main__':
     parser.add_argument('pg_pwd', type=str, help='Password for Postgres database')
     parser.add_argument('pg_host', type=str, help='Path to Postgres host')
     parser.add_argument('queries', type=str, help='Path to input queries')
+    parser.add_argument(
+        '--in_process', action='store_true', 
+        help='Execute queries without spawning Python processes')
+    parser.add_argument(
+        '--table_cache_mb', type=int, default=1024, 
+        help='Memory budget (in MB) for caching tables in process')
+    parser.add_argument(
+        '--plan_cache', action='store_true', 
+        help='Store query plans on disk for later validation runs')
     args = parser.parse_args()
     
     print(f'Comparing query results to Postgres on sample queries ...')
     paths = dbz.util.DbzPaths(args.data_dir)
     with open(args.lib_path) as file:
         library = file.read()
+    cache_dir = paths.plan_cache if args.plan_cache else None
+    plan_cache = dbz.plan.PlanCache(paths.schema, cache_dir=cache_dir)
     dbz_engine = dbz.engine.DbzEngine(
-        paths, library, args.python)
+        paths, library, args.python, args.in_process, plan_cache, 
+        table_cache_mb=args.table_cache_mb)
     pg_engine = dbz.engine.PgEngine(
         args.pg_db, args.pg_user, 
         args.pg_pwd, args.pg_host)
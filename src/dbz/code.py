@@ -3,21 +3,86 @@ Created on Mar 10, 2022
 
 @author: immanueltrummer
 '''
+import dbz.rewrite
 import dbz.util
+import hashlib
+import json
+import os
+import re
+
+
+class CodeCache():
+    """ Caches generated and compiled code for query plans. """
+    
+    def __init__(self, capacity=1000):
+        """ Initializes empty cache.
+        
+        Args:
+            capacity: maximal number of cached query plans
+        """
+        self.entries = dbz.util.LruCache(capacity)
+    
+    def get(self, plan, library_hash, include_hash, scan_paths):
+        """ Retrieves code for given plan and library version.
+        
+        Args:
+            plan: query plan in JSON
+            library_hash: hash of operator library
+            include_hash: hash of included helper functions
+            scan_paths: paths of tables read by code (see Coder)
+        
+        Returns:
+            tuple of source code and code object or None if not cached
+        """
+        key = self._key(plan, library_hash, include_hash, scan_paths)
+        return self.entries.get(key)
+    
+    def put(self, plan, library_hash, include_hash, scan_paths, source):
+        """ Compiles code for given plan and adds it to cache.
+        
+        Args:
+            plan: query plan in JSON
+            library_hash: hash of operator library
+            include_hash: hash of included helper functions
+            scan_paths: paths of tables read by code (see Coder)
+            source: Python code realizing query plan
+        
+        Returns:
+            tuple of source code and code object
+        """
+        key = self._key(plan, library_hash, include_hash, scan_paths)
+        entry = (source, compile(source, '<dbz-query>', 'exec'))
+        self.entries.put(key, entry)
+        return entry
+    
+    def _key(self, plan, library_hash, include_hash, scan_paths):
+        """ Combines hashes of plan, library, and helper functions. """
+        plan_json = json.dumps(plan, sort_keys=True)
+        plan_hash = hashlib.sha256(plan_json.encode('utf-8')).hexdigest()
+        return (plan_hash, library_hash, include_hash, tuple(scan_paths))
+
 
 class Coder():
     """ Translates query plans into code. """
     
-    def __init__(self, paths, print_results):
+    def __init__(self, paths, print_results, row_by_row=True):
         """ Initialize variables and paths. 
         
         Args:
             paths: relevant paths
             print_results: print out samples from intermediate results?
+            row_by_row: whether library processes columns row by row
         """
         self.paths = paths
         self.id_to_plan = {}
+        self.selections = {}
         self.print_results = print_results
+        self.row_by_row = row_by_row
+        self.nr_sub_selections = 0
+        self.nr_scalar_vars = 0
+        self.scalar_consts = []
+        self.scalar_columns = []
+        self.scalar_refs = set()
     
     def plan_code(self, plan):
         """ Translates plan into code.
@@ -28,16 +93,42 @@ class Coder():
         Returns:
             Python code (referencing library operators).
         """
+        plan = dbz.rewrite.detect_anti_joins(plan)
+        plan = dbz.rewrite.prune_columns(plan)
+        plan = dbz.rewrite.push_predicates(plan)
         self.id_to_plan = {}
+        self.selections = {}
         lines = []
         for step in plan['rels']:
             lines += [self._step_code(step)]
         
         final_step = plan['rels'][-1]
+        final_id = final_step['id']
+        if final_id in self.selections:
+            lines += [
+                f'last_result = gather_columns(' +\
+                f'last_result, {self.selections[final_id]})']
         lines += [self._post_code(final_step)]
 
         return '\n'.join(lines)
     
+    def scan_paths(self, plan):
+        """ Returns paths of tables read by code generated for plan.
+        
+        Paths depend on the data directory and on the storage format
+        (CSV or binary) of each table, both of which are embedded
+        into generated code.
+        
+        Args:
+            plan: query plan in JSON
+        
+        Returns:
+            list of table paths, ordered by plan step
+        """
+        return [
+            self._table_path(step) for step in plan['rels'] 
+            if step['relOp'] == 'LogicalTableScan']
+    
     def _agg_code(self, agg, groups, indent=0):
         """ Generates code for processing aggregates.
         
@@ -75,6 +166,157 @@ class Coder():
         prefix = '\t' * indent
         return '\n'.join([prefix + p for p in parts])
     
+    def _group_code(self, step):
+        """ Generates code for grouped aggregation.
+        
+        Libraries processing rows one by one aggregate in a single
+        loop over the input. Array-based libraries use per-group
+        operators, processing entire columns.
+        
+        Args:
+            step: plan step representing grouped aggregates
+        
+        Returns:
+            code assigning group and aggregate columns to agg_columns
+        """
+        if self.row_by_row:
+            return self._group_loop_code(step)
+        else:
+            return self._group_library_code(step)
+    
+    def _group_library_code(self, step):
+        """ Generates code for grouped aggregation via per-group operators.
+        
+        Args:
+            step: plan step representing grouped aggregates
+        
+        Returns:
+            code assigning group and aggregate columns to agg_columns
+        """
+        aggs = step['aggs']
+        groups = step['group']
+        nr_cols = len(groups) + len(aggs)
+        group_by_list = ', '.join(f'input_rel[{g}]' for g in groups)
+        
+        parts = []
+        parts += [f'row_id_rows=to_row_format([{group_by_list}])']
+        parts += ['row_id_column=to_tuple_column(row_id_rows)']
+        parts += ['id_tuples=set([tuple(g) for g in row_id_rows])']
+        parts += ['agg_dicts = []']
+        outputs = ['*key']
+        for agg_idx, agg in enumerate(aggs):
+            parts += [self._agg_code(agg, groups)]
+            parts += ['agg_dicts += [agg_result]']
+            def_val = 0 if agg['agg']['kind'] == 'COUNT' else None
+            outputs += [f'agg_dicts[{agg_idx}].get(key, {def_val})']
+        output_list = ', '.join(outputs)
+        parts += [f'agg_rows = [[{output_list}] for key in id_tuples]']
+        parts += [f'agg_columns = rows_to_columns(agg_rows,{nr_cols})']
+        return '\n'.join(parts)
+    
+    def _group_loop_code(self, step):
+        """ Generates code for grouped aggregation in a single pass.
+        
+        The generated loop maps each group key to a list of running
+        accumulators (sum and count for SUM and AVG, a running bound
+        for MIN and MAX, a counter for COUNT). Distinct aggregates
+        are calculated separately via per-group functions.
+        
+        Args:
+            step: plan step representing grouped aggregates
+        
+        Returns:
+            code assigning group and aggregate columns to agg_columns
+        """
+        aggs = step['aggs']
+        groups = step['group']
+        nr_cols = len(groups) + len(aggs)
+        distinct = [agg for agg in aggs if agg['distinct']]
+        fused = [agg for agg in aggs if not agg['distinct']]
+        
+        parts = []
+        if distinct:
+            group_by_list = ', '.join(
+                f'column_codes(input_rel[{g}])' for g in groups)
+            parts += [f'row_id_rows=to_row_format([{group_by_list}])']
+            parts += ['row_id_column=to_tuple_column(row_id_rows)']
+            parts += ['agg_dicts = []']
+            for agg in distinct:
+                parts += [self._agg_code(agg, groups)]
+                parts += ['agg_dicts += [agg_result]']
+        
+        # Group by codes of dictionary-encoded columns
+        col_idxs = sorted({o for agg in fused for o in agg['operands']})
+        col_vars = ', '.join(
+            [f'g_{i}' for i in range(len(groups))] + 
+            [f'c_{i}' for i in col_idxs])
+        col_list = ', '.join(
+            [f'column_codes(input_rel[{g}])' for g in groups] + 
+            [f'input_rel[{i}]' for i in col_idxs])
+        key = '(' + ''.join(f'g_{i}, ' for i in range(len(groups))) + ')'
+        
+        inits = []
+        updates = []
+        outputs = [f'key[{i}]' for i in range(len(groups))]
+        for agg in aggs:
+            kind = agg['agg']['kind']
+            if agg['distinct']:
+                dict_idx = distinct.index(agg)
+                def_val = 0 if kind == 'COUNT' else None
+                outputs += [f'agg_dicts[{dict_idx}].get(key, {def_val})']
+                continue
+            
+            slot = len(inits)
+            acc = f'acc[{slot}]'
+            operands = agg['operands']
+            value = f'c_{operands[0]}' if operands else None
+            if kind == 'COUNT':
+                inits += ['0']
+                update = [f'{acc} += 1']
+                outputs += [acc]
+            elif kind in ['SUM', 'AVG']:
+                inits += ['0', '0']
+                count = f'acc[{slot+1}]'
+                update = [f'{acc} += {value}', f'{count} += 1']
+                total = f'{acc} / {count}' if kind == 'AVG' else acc
+                outputs += [f'{total} if {count} else None']
+            elif kind in ['MIN', 'MAX']:
+                inits += ['None']
+                comparator = '<' if kind == 'MIN' else '>'
+                update = [
+                    f'if {acc} is None or {value} {comparator} {acc}:',
+                    f'\t{acc} = {value}']
+                outputs += [acc]
+            else:
+                raise NotImplementedError(f'Aggregate {kind} not supported')
+            
+            if operands:
+                not_null = ' and '.join(
+                    f'c_{o} is not None' for o in operands)
+                updates += [f'\tif {not_null}:']
+                updates += ['\t\t' + u for u in update]
+            else:
+                updates += ['\t' + u for u in update]
+        
+        init_list = ', '.join(inits)
+        parts += ['group_accs = {}']
+        parts += [f'for {col_vars}, in zip({col_list}):']
+        parts += [f'\tkey = {key}']
+        parts += ['\tacc = group_accs.get(key)']
+        parts += ['\tif acc is None:']
+        parts += [f'\t\tacc = group_accs[key] = [{init_list}]']
+        parts += updates
+        output_list = ', '.join(outputs)
+        parts += [
+            f'agg_rows = [[{output_list}] ' +\
+            'for key, acc in group_accs.items()]']
+        parts += [f'agg_columns = rows_to_columns(agg_rows,{nr_cols})']
+        for group_idx, group in enumerate(groups):
+            parts += [
+                f'agg_columns[{group_idx}] = restore_encoding(' +\
+                f'agg_columns[{group_idx}], input_rel[{group}])']
+        return '\n'.join(parts)
+    
     def _assignment(self, step, op_code):
         """ Returns code for assigning operation result to variable.
         
@@ -190,7 +432,31 @@ class Coder():
             pad_to = new_type['precision']
             return f'smart_padding({operand_code},{pad_to})'
         else:
-            return f'cast_to_{new_type_name}({operand_code})'
+            return f'cast_to_{new_type_name}(writable({operand_code}))'
+    
+    def _condition_cost(self, condition):
+        """ Estimates relative cost of evaluating a filter condition.
+        
+        Comparisons between columns and literals are cheapest, with
+        equality comparisons being most selective. Other conditions
+        (e.g., LIKE or disjunctions) are ordered by expression size.
+        
+        Args:
+            condition: a Boolean expression
+        
+        Returns:
+            tuple to compare condition costs
+        """
+        size = len(json.dumps(condition))
+        kind = condition['op']['kind'] if 'op' in condition else None
+        comparisons = [
+            'LESS_THAN', 'LESS_THAN_OR_EQUAL', 'GREATER_THAN',
+            'GREATER_THAN_OR_EQUAL', 'NOT_EQUALS']
+        if kind in ['EQUALS'] + comparisons and \
+            all('input' in o or 'literal' in o for o in condition['operands']):
+            return (0 if kind == 'EQUALS' else 1, size)
+        else:
+            return (2, size)
     
     def _column_code(self, column_ref):
         """ Generate code retrieving column of last result. 
@@ -221,6 +487,72 @@ class Coder():
             f'Unsupported extraction: {field}'
         return f'smart_date_extract({source_code},"{field}")'
     
+    def _fused_code(self, operation):
+        """ Generates code evaluating an expression in a single loop.
+        
+        The expression is translated into one scalar Python expression,
+        evaluated for each row without materializing intermediate
+        columns. NULL values are propagated as in the operators.
+        
+        Args:
+            operation: translate this operation into code
+        
+        Returns:
+            code evaluating operation (None if not supported)
+        """
+        if not dbz.util.get_column_refs(operation):
+            return None
+        operands = operation['operands']
+        if operation['op']['kind'] == 'LIKE' and 'input' in operands[0]:
+            # Operator evaluates pattern once per dictionary entry
+            return None
+        
+        self.nr_scalar_vars = 0
+        self.scalar_consts = []
+        self.scalar_columns = []
+        self.scalar_refs = set()
+        try:
+            scalar_code = self._scalar_code(operation)
+        except NotImplementedError:
+            return None
+        
+        # Values computed once for all rows
+        const_loops = ''.join(
+            f'for {var} in [{code}] ' for var, code in self.scalar_consts)
+        col_idxs = sorted(self.scalar_refs)
+        col_vars = [f'c_{i}' for i in col_idxs]
+        col_vars += [var for var, _ in self.scalar_columns]
+        col_list = [f'column_values(input_rel[{i}])' for i in col_idxs]
+        col_list += [f'column_values({c})' for _, c in self.scalar_columns]
+        return f'[{scalar_code} {const_loops}' +\
+            f'for {", ".join(col_vars)}, in zip({", ".join(col_list)})]'
+    
+    def _gather_code(self, step):
+        """ Generates code materializing selected rows of step inputs.
+        
+        Projections only gather the columns they refer to.
+        
+        Args:
+            step: plan step whose inputs may have selection vectors
+        
+        Returns:
+            list of code lines, assigning selected rows to input variables
+        """
+        parts = []
+        for in_id in step['inputs']:
+            selection = self.selections.get(in_id)
+            if selection is not None:
+                col_idxs = None
+                if step['relOp'] == 'LogicalProject':
+                    col_idxs = dbz.util.get_column_refs(step['exprs'])
+                    col_idxs = sorted(col_idxs) if col_idxs else [0]
+                in_result = self._result_name(in_id)
+                in_name = self._input_name(step, in_id)
+                parts += [
+                    f'{in_name} = gather_columns(' +\
+                    f'{in_result}, {selection}, {col_idxs})']
+        return parts
+    
     def _get_precision(self, node):
         """ Extract precision for chars and numeric nodes.
         
@@ -243,6 +575,25 @@ class Coder():
         """
         return node['type'].get('scale', None)
     
+    def _input_name(self, step, in_id):
+        """ Returns name of variable storing rows of a step input.
+        
+        Rows selected by filters are gathered into a separate variable
+        for each consuming step (except filters, which narrow down the
+        selection). Filter results are shared by all consumers.
+        
+        Args:
+            step: plan step consuming input
+            in_id: ID of input step
+        
+        Returns:
+            name of variable storing input rows for step
+        """
+        if in_id in self.selections and step['relOp'] != 'LogicalFilter':
+            return f'input_{in_id}_{step["id"]}'
+        else:
+            return self._result_name(in_id)
+    
     def _like_code(self, node):
         """ Generate code for evaluating LIKE expression.
         
@@ -254,10 +605,79 @@ class Coder():
         """
         operands = node['operands']
         to_test = self._operation_code(operands[0])
-        like_expr = self._operation_code(operands[1])
-        like_expr = f'get_value({like_expr},0).replace(\'%\', \'.*\')'
-        pred_code = f'lambda s:None if s is None else re.match({like_expr}, s) is not None'
-        return f'map_column({to_test}, {pred_code})'
+        escape = self._like_escape(node)
+        if 'literal' in operands[1]:
+            pattern = operands[1]['literal']
+            kind, text = self._like_pattern(pattern, escape)
+            return f'match_like({to_test}, {repr(kind)}, {repr(text)})'
+        else:
+            # Patterns may differ per row
+            patterns = self._operation_code(operands[1])
+            return f'match_like_rows({to_test}, {patterns}, {repr(escape)})'
+    
+    def _like_escape(self, node):
+        """ Extracts escape character of LIKE expression.
+        
+        Args:
+            node: describes LIKE expression
+        
+        Returns:
+            escape character or None (if not specified)
+        """
+        operands = node['operands']
+        if len(operands) < 3:
+            return None
+        elif 'literal' not in operands[2]:
+            raise NotImplementedError('Only literal LIKE escapes supported')
+        else:
+            return operands[2]['literal']
+    
+    def _like_pattern(self, pattern, escape=None):
+        """ Translates LIKE pattern into a string test.
+        
+        Patterns with wildcards % only at the beginning or end are
+        evaluated via string methods, other patterns via regular
+        expressions.
+        
+        Args:
+            pattern: LIKE pattern
+            escape: characters after it are no wildcards (optional)
+        
+        Returns:
+            tuple: test kind (prefix, suffix, contains, equals, or regex) 
+                and string to test for
+        """
+        tokens = []
+        chars = iter(pattern)
+        for char in chars:
+            if char == escape:
+                char = next(chars, None)
+                if char is None:
+                    raise ValueError(
+                        f'LIKE pattern ends with escape character: {pattern}')
+                tokens += [(char, False)]
+            else:
+                tokens += [(char, char in '%_')]
+        
+        starts = tokens[:1] == [('%', True)]
+        ends = len(tokens) > starts and tokens[-1] == ('%', True)
+        inner = tokens[int(starts):len(tokens)-int(ends)]
+        if any(wildcard for _, wildcard in inner):
+            wildcards = {'%':'.*', '_':'.'}
+            regex = ''.join(
+                wildcards[c] if wildcard else re.escape(c) 
+                for c, wildcard in tokens)
+            return 'regex', '(?s)' + regex
+        
+        inner = ''.join(c for c, _ in inner)
+        if starts and ends:
+            return 'contains', inner
+        elif starts:
+            return 'suffix', inner
+        elif ends:
+            return 'prefix', inner
+        else:
+            return 'equals', inner
     
     def _literal_code(self, literal, embed=True):
         """ Produces a code snippet producing given literal.
@@ -299,30 +719,8 @@ class Coder():
         
         grouping = True if groups else False
         if grouping:
-            nr_group_cols = len(groups)
-            group_by_cols = [f'input_rel[{g}]' for g in groups]
-            group_by_list = ', '.join(group_by_cols)
-            parts += [f'row_id_rows=to_row_format([{group_by_list}])']
-            parts += ['row_id_column=to_tuple_column(row_id_rows)']
-            
-            parts += ['id_tuples=list(set([tuple(g) for g in row_id_rows]))']
-            parts += ['id_rows=[list(t) for t in id_tuples]']
-            parts += [f'id_columns=rows_to_columns(id_rows,{nr_group_cols})']
-            parts += [f'{result} += id_columns']
-            
-            parts += ['agg_dicts_defs = []']
-            for agg in aggs:
-                parts += [self._agg_code(agg, groups)]
-                def_val = 0 if agg['agg']['kind'] == 'COUNT' else None
-                parts += [f'agg_dicts_defs += [(agg_result,{def_val})]']
-            parts += ['agg_rows = []']
-            parts += ['for id_tuple in id_tuples:']
-            parts += [
-                '\tagg_rows += [' +\
-                '[dict_def[0].get(id_tuple, dict_def[1]) ' +\
-                'for dict_def in agg_dicts_defs]]']
-            nr_aggs = len(aggs)
-            parts += [f'{result} += rows_to_columns(agg_rows,{nr_aggs})']
+            parts += [self._group_code(step)]
+            parts += [f'{result} += agg_columns']
 
         else:
         
@@ -343,22 +741,42 @@ class Coder():
     def _LogicalFilter(self, step):
         """ Produce code for a filter.
         
+        Filters do not copy their input columns. Instead, the result
+        refers to the input columns together with a selection vector,
+        containing indexes of rows satisfying the filter condition.
+        Each conjunct is only evaluated on rows satisfying the prior
+        conjuncts.
+        
         Args:
             step: plan step representing filter
         
         Returns:
             code realizing filter
         """
-        result = self._result_name(step['id'])
+        step_id = step['id']
+        result = self._result_name(step_id)
+        in_id = step['inputs'][0]
+        in_result = self._result_name(in_id)
+        in_selection = self.selections.get(in_id)
         condition = step['condition']
-        pred_code = self._operation_code(condition)
-        parts = [f'p_idx = {pred_code}']
-        parts += [f'{result} = [filter_column(c, p_idx) for c in input_rel]']
+        self.nr_sub_selections = 0
+        parts, sub_selection = self._selection_code(
+            step_id, condition, in_result, in_selection)
+        selection = self._selection_name(step_id)
+        parts += [f'{selection} = {sub_selection}']
+        parts += [f'{result} = {in_result}']
+        self.selections[step_id] = selection
         return '\n'.join(parts)
     
     def _LogicalJoin(self, step):
         """ Produce code for an equality join.
         
+        The join determines pairs of matching row indexes, based on
+        equality predicates between columns. Other predicates are
+        evaluated on the matching pairs. Output columns are gathered
+        from the input columns using row indexes. Semi and anti joins
+        only determine rows of the left input with or without partner.
+        
         Args:
             step: plan step representing join
         
@@ -367,61 +785,87 @@ class Coder():
         """
         inputs = step['inputs']
         assert(len(inputs) == 2)
-        operands = [self._result_name(step_id) for step_id in inputs]
+        operands = [self._input_name(step, in_id) for in_id in inputs]
         step_id = step['id']
         result = self._result_name(step_id)
+        left_plan = self.id_to_plan[inputs[0]]
+        left_width = len(left_plan['outputType']['fields'])
         
-        params = operands
-        params = [f'to_row_format({p})' for p in params]
         join_pred = step['condition']
         conjuncts = dbz.util.get_conjuncts(join_pred)
         
         def is_eq_col_pred(pred):
-            """ Returns true iff equality between two columns. """
+            """ Returns true iff equality between columns of both inputs. """
             if pred['op']['kind'] == 'EQUALS' and \
                 all('input' in op for op in pred['operands']):
-                return True
+                col_idxs = [op['input'] for op in pred['operands']]
+                return min(col_idxs) < left_width <= max(col_idxs)
             else:
                 return False
 
-        eq_cols = []
+        left_keys = []
+        right_keys = []
         join_preds = [c for c in conjuncts if is_eq_col_pred(c)]
         for join_pred in join_preds:
             col_idxs = [op['input'] for op in join_pred['operands']]
-            col_idx_1 = min(col_idxs)
-            col_idx_2_raw = max(col_idxs)
-            in_1_name = self._result_name(inputs[0])
-            col_idx_2 = f'{col_idx_2_raw}-len({in_1_name})'
-            eq_cols += [f'({col_idx_1},{col_idx_2})']
+            left_keys += [f'{operands[0]}[{min(col_idxs)}]']
+            right_keys += [f'{operands[1]}[{max(col_idxs) - left_width}]']
 
-        params += [f'[{", ".join(eq_cols)}]']
-        op_code = f'equi_join({", ".join(params)})'
-        
         parts = []
-        parts += [f'{result} = {op_code}']
-        nr_out_cols = len(step['outputType']['fields'])
         join_type = step['joinType']
-        if join_type in ['left', 'full']:
+        filter_preds = [c for c in conjuncts if not is_eq_col_pred(c)]
+        nr_rows_code = \
+            f'nr_rows({operands[0]}[0]), nr_rows({operands[1]}[0])'
+        if join_type in ['semi', 'anti'] and not filter_preds:
+            anti = join_type == 'anti'
             parts += [
-                f'{result} = {result} + ' +\
-                f'complete_outer(to_row_format(' +\
-                f'{operands[0]}),0,{nr_out_cols},{result})']
-        if join_type in ['right', 'full']:
+                f'left_idxs = semi_join_indexes(' +\
+                f'[{", ".join(left_keys)}], ' +\
+                f'[{", ".join(right_keys)}], {anti})']
+        elif join_preds:
+            parts += [
+                f'left_idxs, right_idxs = join_indexes(' +\
+                f'[{", ".join(left_keys)}], [{", ".join(right_keys)}])']
+        else:
             parts += [
-                f'{result} = {result} + ' +\
-                f'complete_outer(to_row_format(' +\
-                f'{operands[1]}),1,{nr_out_cols},{result})']
-        parts += [f'{result} = rows_to_columns({result},{nr_out_cols})']
+                f'left_idxs, right_idxs = cross_pairs({nr_rows_code})']
+        gather_code = \
+            f'gather_columns({operands[0]}, left_idxs) + ' +\
+            f'gather_columns({operands[1]}, right_idxs)'
         
-        filter_preds = [c for c in conjuncts if not is_eq_col_pred(c)]
         if filter_preds:
-            parts += [f'input_rel = {result}']
+            parts += [f'input_rel = {gather_code}']
             filter_codes = []
             for filter_pred in filter_preds:
                 filter_code = self._operation_code(filter_pred)
                 filter_codes += [filter_code]
             parts += [f'p_idx = logical_and([{", ".join(filter_codes)}])']
-            parts += [f'{result} = [filter_column(c,p_idx) for c in {result}]']
+            parts += [
+                'left_idxs, right_idxs = ' +\
+                'filter_pairs(left_idxs, right_idxs, p_idx)']
+        
+        if join_type in ['semi', 'anti']:
+            if filter_preds:
+                anti = join_type == 'anti'
+                parts += [
+                    f'left_idxs = matched_rows(left_idxs, ' +\
+                    f'nr_rows({operands[0]}[0]), {anti})']
+            parts += [
+                f'{result} = gather_columns({operands[0]}, left_idxs)']
+            if step.get('nullPadding', False):
+                # Anti join replacing left outer join: no right values
+                parts += [
+                    f'{result} += [fill_column(None, len(left_idxs)) ' +\
+                    f'for _ in {operands[1]}]']
+        else:
+            if join_type in ['left', 'right', 'full']:
+                keep_left = join_type in ['left', 'full']
+                keep_right = join_type in ['right', 'full']
+                parts += [
+                    f'left_idxs, right_idxs = outer_pairs(' +\
+                    f'left_idxs, right_idxs, {nr_rows_code}, ' +\
+                    f'{keep_left}, {keep_right})']
+            parts += [f'{result} = {gather_code}']
         
         return '\n'.join(parts)
     
@@ -437,8 +881,10 @@ class Coder():
         step_id = step['id']
         result = self._result_name(step_id)
         parts = []
-        parts += [f'{result} = []']
         exprs = step['exprs']
+        shared_parts, exprs = self._shared_code(exprs)
+        parts += shared_parts
+        parts += [f'{result} = []']
         for expr in exprs:
             expr_code = self._operation_code(expr)
             col_code = f'column = {expr_code}'
@@ -460,27 +906,33 @@ class Coder():
         """
         step_id = step['id']
         result = self._result_name(step_id)
-        parts = [f'{result} = to_row_format(input_rel)']
+        parts = [f'{result} = input_rel']
         
-        if 'collation' in step:
-            parts += ['def comparator(row_1, row_2):']
-            collation = step['collation']
-            for d in collation:
+        if step.get('collation', []):
+            collation = []
+            for d in step['collation']:
                 field_idx = int(d['field'])
-                flag = True if d['direction'] == 'ASCENDING' else False
-                parts += [f'\tif row_1[{field_idx}] < row_2[{field_idx}]:']
-                parts += [f'\t\treturn {-1 if flag else 1}']
-                parts += [f'\telif row_1[{field_idx}] > row_2[{field_idx}]:']
-                parts += [f'\t\treturn {1 if flag else -1}']
-            parts += ['\treturn 0']
-            parts += [f'{result} = sort({result}, comparator)']
-        
-        if 'fetch' in step:
+                descending = d['direction'] in [
+                    'DESCENDING', 'STRICTLY_DESCENDING']
+                # Default: NULL values are treated as largest values
+                nulls = d.get('nulls', 'UNSPECIFIED')
+                if nulls == 'UNSPECIFIED':
+                    nulls_first = descending
+                else:
+                    nulls_first = nulls == 'FIRST'
+                collation += [(field_idx, descending, nulls_first)]
+            if 'fetch' in step:
+                nr_rows = step['fetch']['literal']
+                parts += [
+                    f'{result} = top_n_columns(' +\
+                    f'{result}, {collation}, {nr_rows})']
+            else:
+                parts += [f'{result} = sort_columns({result}, {collation})']
+        
+        elif 'fetch' in step:
             nr_rows = step['fetch']['literal']
-            parts += [f'{result} = {result}[:{nr_rows}]']
+            parts += [f'{result} = [c[:{nr_rows}] for c in {result}]']
         
-        out_arity = len(step['outputType']['fields'])
-        parts += [f'{result} = rows_to_columns({result},{out_arity})']
         parts += [f'last_result = {result}']
         return '\n'.join(parts)
 
@@ -496,10 +948,10 @@ class Coder():
         # db = step['table'][0]
         # table = step['table'][1]
         # file_path = f'{self.data_dir}/{db}/{table}'
-        table = step['table'][0]
-        file_path = f'{self.paths.data_dir}/{table.lower()}.csv'
-        scan_code = f'new_table = load_from_csv("{file_path}")\n' +\
-            'new_table = to_columnar_format(new_table)'
+        file_path = self._table_path(step)
+        col_idxs = step.get('columns', None)
+        ranges = step.get('ranges', None)
+        scan_code = f'new_table = scan_table("{file_path}", {col_idxs}, {ranges})'
         return scan_code + '\n' + self._assignment(step, 'new_table')
     
     def _LogicalValues(self, step):
@@ -542,6 +994,22 @@ class Coder():
         params = [self._operation_code(operand) for operand in operands]
         return f'{op_name}(fix_rel([{", ".join(params)}]))'
     
+    def _null_safe_code(self, checks, code):
+        """ Generates code evaluating to NULL if any operand is NULL.
+        
+        Args:
+            checks: code testing operands for NULL (None if not nullable)
+            code: code evaluating operation on non-NULL operands
+        
+        Returns:
+            code evaluating operation with NULL propagation
+        """
+        checks = [c for c in checks if c is not None]
+        if checks:
+            return f'(None if {" or ".join(checks)} else {code})'
+        else:
+            return f'({code})'
+    
     def _operation_code(self, operation):
         """ Generate code realizing given operation. 
         
@@ -553,7 +1021,13 @@ class Coder():
         """
         if 'literal' in operation:
             return self._literal_code(operation)
-        elif 'input' in operation:
+        elif 'op' in operation and self.row_by_row:
+            # Library operators are used for array-based columns
+            fused_code = self._fused_code(operation)
+            if fused_code is not None:
+                return fused_code
+        
+        if 'input' in operation:
             return self._column_code(operation)
         elif 'op' in operation:
             syntax = operation['op']['syntax']
@@ -580,6 +1054,29 @@ class Coder():
         
         raise ValueError(f'Unhandled operation: {operation}')
     
+    def _padded_operand(self, node, pad_to):
+        """ Generates scalar code for string operand, padded to given length.
+        
+        Columns are padded before the loop over rows, so padding is
+        applied once per dictionary entry for encoded columns.
+        
+        Args:
+            node: an operand expression node
+            pad_to: pad strings to this length
+        
+        Returns:
+            tuple: code for padded operand value and code testing for NULL
+        """
+        if 'input' in node:
+            column = f'input_rel[{node["input"]}]'
+            var = self._scalar_column(f'smart_padding({column}, {pad_to})')
+            return var, f'{var} is None'
+        elif node.get('literal') is not None:
+            return repr(str(node['literal']).ljust(pad_to)), None
+        else:
+            value, check = self._scalar_operand(node)
+            return f'{value}.ljust({pad_to})', check
+    
     def _post_code(self, final_step):
         """ Code for column-type specific post-processing. 
         
@@ -608,12 +1105,9 @@ class Coder():
                     f'smart_padding(last_result[{col_idx}], ' +\
                     f'{length})']
             elif base_type in ['DATE']:
-                parts += ['from datetime import date, timedelta']
-                parts += ["ref_date = date(1970,1,1)"]
                 parts += [
                     f'last_result[{col_idx}] = ' +\
-                    f'map_column(last_result[{col_idx}],' +\
-                    f'lambda d:str(ref_date + timedelta(days=d)))']
+                    f'format_dates(last_result[{col_idx}])']
         
         parts += ['last_result = to_row_format(last_result)']
         parts += ['last_result = [list(r) for r in last_result]']
@@ -630,6 +1124,284 @@ class Coder():
         """
         return f"result_{step_id}"
     
+    def _scalar_code(self, node):
+        """ Translates expression into scalar code evaluated per row.
+        
+        The generated code refers to the value of column i in the
+        current row as c_i and evaluates to None for NULL values.
+        
+        Args:
+            node: an expression node
+        
+        Returns:
+            Python expression evaluating node on one row
+        
+        Raises:
+            NotImplementedError: if node cannot be evaluated per row
+        """
+        if 'literal' in node:
+            value = node['literal']
+            scale = self._get_scale(node)
+            if value is None:
+                return 'None'
+            elif scale is not None:
+                return repr(round(value * float(f'1e{scale}')))
+            elif node['type']['type'] in ['CHAR', 'VARCHAR', 'TEXT']:
+                return repr(str(value))
+            elif isinstance(value, (bool, int, float)):
+                return repr(value)
+            else:
+                raise NotImplementedError(f'Literal {value} not supported')
+        elif 'input' in node:
+            self.scalar_refs.add(node['input'])
+            return f'c_{node["input"]}'
+        
+        kind = node['op']['kind']
+        name = node['op']['name']
+        operands = node['operands']
+        comparisons = {
+            'LESS_THAN_OR_EQUAL':'<=', 'LESS_THAN':'<',
+            'GREATER_THAN_OR_EQUAL':'>=', 'GREATER_THAN':'>',
+            'EQUALS':'==', 'NOT_EQUALS':'!='}
+        arithmetic = {'PLUS':'+', 'MINUS':'-', 'TIMES':'*', 'DIVIDE':'/'}
+        if kind in comparisons or kind in arithmetic:
+            symbol = {**comparisons, **arithmetic}[kind]
+            op_types = [o['type']['type'] for o in operands]
+            pad_to = None
+            if all(t in ['CHAR', 'VARCHAR'] for t in op_types):
+                precisions = [self._get_precision(o) or 0 for o in operands]
+                if precisions[0] != precisions[1]:
+                    pad_to = max(precisions)
+            if pad_to is None:
+                values, checks = zip(
+                    *[self._scalar_operand(o) for o in operands])
+            else:
+                values, checks = zip(
+                    *[self._padded_operand(o, pad_to) for o in operands])
+            values = list(values)
+            if all(t in ['DECIMAL', 'NUMERIC', 'FLOAT', 'INTEGER'] 
+                   for t in op_types):
+                scales = [self._get_scale(o) for o in operands]
+                result_scale = self._get_scale(node)
+                diffs = self._scale_diffs(*scales, result_scale, kind)
+                for i, diff in enumerate(diffs):
+                    if diff:
+                        values[i] = f'{values[i]} * 1e{diff}'
+            elif not (all(t in ['CHAR', 'VARCHAR'] for t in op_types) or
+                      all(t in ['DATE'] for t in op_types)):
+                raise NotImplementedError(f'Types {op_types} not supported')
+            expression = f'({values[0]}) {symbol} ({values[1]})'
+            return self._null_safe_code(checks, expression)
+        elif kind in ['AND', 'OR']:
+            # SQL semantics: dominant value if any operand has it
+            dominant, other = ('False', 'True') if kind == 'AND' \
+                else ('True', 'False')
+            test = 'not ' if kind == 'AND' else ''
+            values = [self._scalar_var() for _ in operands]
+            tests = [
+                f'((({v} := {self._scalar_code(o)}) is not None) ' +\
+                f'and {test}{v})' for v, o in zip(values, operands)]
+            is_null = ' or '.join(f'{v} is None' for v in values)
+            return f'({dominant} if {" or ".join(tests)} ' +\
+                f'else (None if {is_null} else {other}))'
+        elif kind in [
+            'NOT', 'IS_NULL', 'IS_NOT_NULL', 'IS_TRUE', 'IS_NOT_TRUE', 
+            'IS_FALSE', 'IS_NOT_FALSE']:
+            value, check = self._scalar_operand(operands[0])
+            check = 'False' if check is None else check
+            if kind == 'NOT':
+                return self._null_safe_code([check], f'not ({value})')
+            elif kind in ['IS_NULL', 'IS_NOT_NULL']:
+                code = f'({check})'
+            elif kind in ['IS_TRUE', 'IS_NOT_TRUE']:
+                code = f'(not ({check}) and bool({value}))'
+            else:
+                code = f'(not ({check}) and not ({value}))'
+            return f'(not {code})' if 'NOT' in kind else code
+        elif kind == 'LIKE':
+            if 'literal' not in operands[1]:
+                raise NotImplementedError('Pattern must be a literal')
+            pattern = operands[1]['literal']
+            escape = self._like_escape(node)
+            test_kind, text = self._like_pattern(pattern, escape)
+            if 'input' in operands[0]:
+                # Evaluates pattern once per dictionary entry if encoded
+                column = f'input_rel[{operands[0]["input"]}]'
+                return self._scalar_column(
+                    f'match_like({column}, {test_kind!r}, {text!r})')
+            
+            value, check = self._scalar_operand(operands[0])
+            if test_kind == 'regex':
+                match = self._scalar_const(f're.compile({text!r}).fullmatch')
+                code = f'{match}({value}) is not None'
+            else:
+                text = repr(text)
+                code = {
+                    'prefix':f'{value}.startswith({text})',
+                    'suffix':f'{value}.endswith({text})',
+                    'contains':f'{text} in {value}',
+                    'equals':f'{value} == {text}'
+                    }[test_kind]
+            return self._null_safe_code([check], code)
+        elif name == 'CASE':
+            codes = [self._scalar_code(o) for o in operands]
+            code = codes[-1]
+            for pred_code, if_code in reversed(
+                list(zip(codes[0:-1:2], codes[1:-1:2]))):
+                code = f'(({if_code}) if ({pred_code}) else {code})'
+            return code
+        elif name == 'CAST':
+            operand = operands[0]
+            old_type = {k:v for k, v in operand['type'].items() 
+                        if k != 'nullable'}
+            new_type = {k:v for k, v in node['type'].items() 
+                        if k != 'nullable'}
+            if old_type == new_type:
+                return self._scalar_code(operand)
+            
+            value, check = self._scalar_operand(operand)
+            scale_before = self._get_scale(operand) or 0
+            scale_after = self._get_scale(node) or 0
+            if not (scale_before == scale_after):
+                value = f'{value} * 1e{scale_after - scale_before}'
+            old_type_name = old_type['type'].lower()
+            new_type_name = new_type['type'].lower()
+            if new_type_name == 'integer':
+                code = f'round({value} + 1e-10)'
+            elif old_type_name == 'char' and new_type_name == 'char':
+                code = f'({value}).ljust({new_type["precision"]})'
+            elif new_type_name == 'float':
+                code = f'float({value})'
+            else:
+                raise NotImplementedError(f'Cast to {new_type} not supported')
+            return self._null_safe_code([check], code)
+        else:
+            raise NotImplementedError(f'Operation {kind} not supported')
+    
+    def _scalar_column(self, code):
+        """ Returns variable storing values of a column computed upfront.
+        
+        The column is computed before the loop over rows, e.g. to use
+        operators processing distinct values of encoded columns once.
+        
+        Args:
+            code: code computing column
+        
+        Returns:
+            name of variable storing current row value in scalar code
+        """
+        var = self._scalar_var()
+        self.scalar_columns += [(var, code)]
+        return var
+    
+    def _scalar_const(self, code):
+        """ Returns variable storing a value computed once for all rows.
+        
+        Args:
+            code: code computing value
+        
+        Returns:
+            name of variable storing value in scalar code
+        """
+        var = self._scalar_var()
+        self.scalar_consts += [(var, code)]
+        return var
+    
+    def _scalar_operand(self, node):
+        """ Generates scalar code for operand of NULL-intolerant operation.
+        
+        Args:
+            node: an operand expression node
+        
+        Returns:
+            tuple: code for operand value and code testing for NULL
+        """
+        code = self._scalar_code(node)
+        if 'literal' in node:
+            return code, 'True' if node['literal'] is None else None
+        elif 'input' in node:
+            return code, f'{code} is None'
+        else:
+            var = self._scalar_var()
+            return var, f'({var} := {code}) is None'
+    
+    def _scalar_var(self):
+        """ Returns name for a new variable in scalar code.
+        
+        Returns:
+            name of a variable storing intermediate values for one row
+        """
+        self.nr_scalar_vars += 1
+        return f'v_{self.nr_scalar_vars}'
+    
+    def _selection_code(self, step_id, condition, columns, selection):
+        """ Generates code narrowing down a selection vector by a condition.
+        
+        Conjuncts are evaluated in turn, each on the rows satisfying
+        all prior conjuncts. Disjuncts are evaluated in turn, each on
+        the rows not satisfying any prior disjunct. Cheap and likely
+        selective conditions are evaluated first.
+        
+        Args:
+            step_id: ID of filter step
+            condition: condition to evaluate
+            columns: name of variable storing (unselected) input columns
+            selection: name of variable storing input selection (or None)
+        
+        Returns:
+            tuple: list of code lines and name of output selection variable
+        """
+        kind = condition['op']['kind'] if 'op' in condition else None
+        parts = []
+        if kind == 'AND':
+            conjuncts = dbz.util.get_conjuncts(condition)
+            for conjunct in sorted(conjuncts, key=self._condition_cost):
+                conjunct_parts, selection = self._selection_code(
+                    step_id, conjunct, columns, selection)
+                parts += conjunct_parts
+        elif kind == 'OR':
+            disjuncts = sorted(condition['operands'], key=self._condition_cost)
+            remaining = selection
+            matches = []
+            for disjunct_idx, disjunct in enumerate(disjuncts):
+                disjunct_parts, match = self._selection_code(
+                    step_id, disjunct, columns, remaining)
+                parts += disjunct_parts
+                matches += [match]
+                if disjunct_idx < len(disjuncts) - 1:
+                    remaining = self._sub_selection_name(step_id)
+                    parts += [
+                        f'{remaining} = exclude_indexes(' +\
+                        f'{selection}, [{", ".join(matches)}], ' +\
+                        f'nr_rows({columns}[0]))']
+            selection = self._sub_selection_name(step_id)
+            parts += [f'{selection} = union_indexes([{", ".join(matches)}])']
+        else:
+            if selection is not None:
+                pred_cols = sorted(dbz.util.get_column_refs(condition))
+                parts += [
+                    f'input_rel = gather_columns(' +\
+                    f'{columns}, {selection}, {pred_cols})']
+            pred_code = self._operation_code(condition)
+            parts += [f'p_idx = {pred_code}']
+            in_selection = selection
+            selection = self._sub_selection_name(step_id)
+            parts += [
+                f'{selection} = selection_indexes(' +\
+                f'p_idx, {in_selection}, nr_rows({columns}[0]))']
+        return parts, selection
+    
+    def _selection_name(self, step_id):
+        """ Returns name of selection vector variable.
+        
+        Args:
+            step_id: return name of selection vector of this step
+        
+        Returns:
+            name of variable storing row indexes selected by step
+        """
+        return f"selection_{step_id}"
+    
     def _scale_diffs(self, scale_1, scale_2, result_scale, op_kind):
         """ Calculate required (re)scaling for inputs to binary operation.
         
@@ -664,6 +1436,68 @@ class Coder():
         else:
             raise NotImplementedError(f'Scaling {op_kind} not implemented!')
     
+    def _shared_code(self, exprs):
+        """ Generates code evaluating repeated expression subtrees once.
+        
+        Each operation subtree that occurs repeatedly in the given
+        expressions is evaluated into a temporary column, appended
+        to the input columns. Occurrences of the subtree are replaced
+        by references to that column. Subtrees of CASE expressions
+        are not considered as they are not evaluated for all rows.
+        
+        Args:
+            exprs: list of expressions evaluated on input_rel
+        
+        Returns:
+            tuple: list of code lines and list of rewritten expressions
+        """
+        seen = set()
+        shared = set()
+        
+        def collect(node):
+            """ Collects keys of repeated subtrees, top-down. """
+            if 'op' not in node or not dbz.util.get_column_refs(node):
+                return
+            key = json.dumps(node, sort_keys=True)
+            if key in seen:
+                shared.add(key)
+            else:
+                seen.add(key)
+                if node['op']['name'] != 'CASE':
+                    for operand in node['operands']:
+                        collect(operand)
+        
+        for expr in exprs:
+            collect(expr)
+        if not shared:
+            return [], exprs
+        
+        parts = []
+        temp_refs = {}
+        nr_inputs = max(dbz.util.get_column_refs(exprs)) + 1
+        
+        def replace(node):
+            """ Replaces shared subtrees, creating temporary columns. """
+            if 'op' not in node:
+                return node
+            key = json.dumps(node, sort_keys=True)
+            if key in temp_refs:
+                return temp_refs[key]
+            if node['op']['name'] != 'CASE':
+                operands = [replace(o) for o in node['operands']]
+                node = {**node, 'operands':operands}
+            if key in shared:
+                temp_idx = nr_inputs + len(temp_refs)
+                temp_code = self._operation_code(node)
+                parts.append(
+                    f'input_rel = input_rel[:{temp_idx}] + [{temp_code}]')
+                temp_refs[key] = {'input':temp_idx, 'type':node['type']}
+                return temp_refs[key]
+            return node
+        
+        exprs = [replace(expr) for expr in exprs]
+        return parts, exprs
+    
     def _step_code(self, step):
         """ Translates one plan step into code.
         
@@ -675,9 +1509,13 @@ class Coder():
         """
         op_id = step['id']
         rel_op = step['relOp']
+        self.id_to_plan[op_id] = step
         parts = []
         parts += [f'# Operation ID: {op_id}; Operator: {rel_op}']
-        inputs = [self._result_name(in_) for in_ in step['inputs']] + ['[]']
+        if rel_op != 'LogicalFilter':
+            parts += self._gather_code(step)
+        inputs = [self._input_name(step, in_) for in_ in step['inputs']]
+        inputs += ['[]']
         if len(inputs) == 2:
             parts += [f'input_rel = ' + ' + '.join(inputs)]
         handler = f'_{rel_op}'
@@ -693,6 +1531,18 @@ class Coder():
             parts += [f'print([c[:min(r,10)] for c in {result}])']
         return '\n'.join(parts)
     
+    def _sub_selection_name(self, step_id):
+        """ Returns name for a new intermediate selection vector.
+        
+        Args:
+            step_id: ID of filter step producing the selection
+        
+        Returns:
+            name of a variable not used for prior selection vectors
+        """
+        self.nr_sub_selections += 1
+        return f'{self._selection_name(step_id)}_{self.nr_sub_selections}'
+    
     def _substring_code(self, operation):
         """ Generates code for extracting substrings.
         
@@ -707,6 +1557,21 @@ class Coder():
         src, start, length = op_codes
         return f'smart_substring({src},{start},{length})'
     
+    def _table_path(self, step):
+        """ Returns path of table read by scan step.
+        
+        Args:
+            step: plan step representing scan
+        
+        Returns:
+            path to binary table directory or (otherwise) to CSV file
+        """
+        table = step['table'][0].lower()
+        file_path = f'{self.paths.data_dir}/{table}'
+        if not os.path.exists(f'{file_path}/meta.json'):
+            file_path = f'{file_path}.csv'
+        return file_path
+    
     def _unary_code(self, operation):
         """ Translates unary operation into code.
         
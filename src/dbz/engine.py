@@ -4,12 +4,19 @@ Created on Mar 6, 2022
 @author: immanueltrummer
 '''
 import abc
+import collections
+import contextlib
 import dbz.code
 import dbz.query
 import dbz.plan
+import hashlib
+import io
+import os
 import pandas as pd
 import psycopg2
 import subprocess
+import sys
+import traceback
 
 
 class Engine(abc.ABC):
@@ -29,24 +36,130 @@ class Engine(abc.ABC):
         raise NotImplementedError()
 
 
+class TableCache():
+    """ Keeps table columns in memory across queries, evicting least recently used. """
+    
+    def __init__(self, max_bytes):
+        """ Initializes cache with given memory budget.
+        
+        Args:
+            max_bytes: maximal (estimated) size of cached columns in bytes
+        """
+        self.max_bytes = max_bytes
+        self.nr_bytes = 0
+        self.columns = collections.OrderedDict()
+    
+    def get(self, path, col_idxs, load):
+        """ Retrieves table columns from cache or loads them from disk.
+        
+        Cached columns are reloaded if their file changed after loading.
+        
+        Args:
+            path: path to file or directory containing table
+            col_idxs: indexes of columns to retrieve
+            load: function loading columns with given indexes from path
+        
+        Returns:
+            list of table columns
+        """
+        mtime = os.stat(path).st_mtime_ns
+        idx_to_column = {}
+        for col_idx in col_idxs:
+            key = (path, col_idx)
+            if key in self.columns:
+                cached_mtime, _, column = self.columns[key]
+                if cached_mtime == mtime:
+                    self.columns.move_to_end(key)
+                    idx_to_column[col_idx] = column
+                else:
+                    self._remove(key)
+        
+        missing = [c for c in col_idxs if c not in idx_to_column]
+        if missing:
+            loaded = load(path, missing)
+            for col_idx, column in zip(missing, loaded):
+                idx_to_column[col_idx] = column
+                self._add((path, col_idx), mtime, column)
+        
+        return [idx_to_column[c] for c in col_idxs]
+    
+    def _add(self, key, mtime, column):
+        """ Adds column to cache and evicts columns if required.
+        
+        Args:
+            key: path of table file and column index
+            mtime: modification time of table file when loading column
+            column: column to insert into cache
+        """
+        nr_bytes = self._size(column)
+        if nr_bytes <= self.max_bytes:
+            self.columns[key] = (mtime, nr_bytes, column)
+            self.nr_bytes += nr_bytes
+            while self.nr_bytes > self.max_bytes:
+                self._remove(next(iter(self.columns)))
+    
+    def _remove(self, key):
+        """ Removes column with given key from cache. """
+        _, nr_bytes, _ = self.columns.pop(key)
+        self.nr_bytes -= nr_bytes
+    
+    def _size(self, column, sample_size=100):
+        """ Estimates memory consumption of column.
+        
+        Args:
+            column: a table column
+            sample_size: estimate value sizes from so many rows
+        
+        Returns:
+            estimated size in bytes
+        """
+        if isinstance(column, memoryview):
+            # Memory-mapped columns reside in the page cache
+            return sys.getsizeof(column)
+        nr_values = len(column)
+        sample = [column[i] for i in range(min(nr_values, sample_size))]
+        value_bytes = sum(sys.getsizeof(v) for v in sample)
+        avg_bytes = value_bytes / len(sample) if sample else 0
+        return sys.getsizeof(column) + avg_bytes * nr_values
+
+
 class DbzEngine(Engine):
     """ Executes given query plans. """
     
-    def __init__(self, paths, library, python_path):
+    def __init__(
+            self, paths, library, python_path, 
+            in_process=False, plan_cache=None, code_cache=None,
+            table_cache_mb=1024):
         """ Initializes with given paths.
         
         Args:
             paths: relevant paths for DB-zero
             library: library with operator code
             python_path: path to Python executable
+            in_process: execute queries in this process (no crash isolation)
+            plan_cache: share this plan cache (use private cache if None)
+            code_cache: share this code cache (use private cache if None)
+            table_cache_mb: keep tables up to this size (in MB) in memory
         """
         self.paths = paths
         self.library = library
         self.python_path = python_path
+        self.in_process = in_process
+        if plan_cache is None:
+            plan_cache = dbz.plan.PlanCache(paths.schema)
         self.planner = dbz.plan.Planner(
             paths.schema, paths.planner, 
-            paths.tmp_dir)
-        self.coder = dbz.code.Coder(paths, True)
+            paths.tmp_dir, paths.planner_socket, 
+            plan_cache)
+        if code_cache is None:
+            code_cache = dbz.code.CodeCache()
+        self.code_cache = code_cache
+        self.library_hash = self._hash(library)
+        self.include_hash = self._hash(''.join(
+            self._include(p)[0] for p in self._include_paths()))
+        self.table_cache_mb = table_cache_mb
+        self.namespace = None
+        self.coder = dbz.code.Coder(paths, True, self._row_by_row())
     
     def execute(self, sql, out):
         """ Execute given query and write out result.
@@ -62,18 +175,29 @@ class DbzEngine(Engine):
         print(f'Simplified query: {sql}')
         plan = self.planner.plan(sql)
         print(f'Plan: {plan}')
+        plan_code, compiled = self._plan_code(plan)
+        if self.in_process:
+            return self._run_in_process(compiled, out)
+        
         code_parts = []
-        code_parts += [self.library]
-        import_path = f'{self.paths.includes}/imports.py'
-        fct_path = f'{self.paths.includes}/functions.py'
-        code_parts += self._include(import_path)
-        code_parts += self._include(fct_path)
-        code_parts += [self.coder.plan_code(plan)]
+        code_parts += [self._library_code()]
+        code_parts += [plan_code]
         code_parts += [f'write_to_csv(last_result, "{out}")']
         code = '\n'.join(code_parts)
         #print(f'Code: {code}')
         return self._run(code)
     
+    def _hash(self, code):
+        """ Calculates hash of given code.
+        
+        Args:
+            code: Python code
+        
+        Returns:
+            hash value identifying code
+        """
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+    
     def _include(self, path):
         """ Loads code from file.
         
@@ -86,6 +210,87 @@ class DbzEngine(Engine):
         with open(path) as file:
             return [file.read()]
     
+    def _library_code(self):
+        """ Assembles operator library and included helper functions.
+        
+        Returns:
+            code defining all functions referenced by query code
+        """
+        code_parts = []
+        code_parts += [self.library]
+        for include_path in self._include_paths():
+            code_parts += self._include(include_path)
+        return '\n'.join(code_parts)
+    
+    def _include_paths(self):
+        """ Returns paths of files with helper functions to include. """
+        import_path = f'{self.paths.includes}/imports.py'
+        storage_path = f'{self.paths.includes}/storage.py'
+        date_path = f'{self.paths.includes}/dates.py'
+        fct_path = f'{self.paths.includes}/functions.py'
+        return [import_path, storage_path, date_path, fct_path]
+    
+    def _load_library(self):
+        """ Compiles library code once into a reusable namespace.
+        
+        Returns:
+            dictionary containing library functions
+        """
+        namespace = {'__name__':'dbz_library'}
+        code = compile(self._library_code(), '<dbz-library>', 'exec')
+        exec(code, namespace)
+        max_bytes = self.table_cache_mb * 1024 * 1024
+        namespace['table_cache'] = TableCache(max_bytes)
+        return namespace
+    
+    def _plan_code(self, plan):
+        """ Generates code for given plan or retrieves it from cache.
+        
+        Args:
+            plan: query plan in JSON
+        
+        Returns:
+            tuple of source code and code object realizing plan
+        """
+        scan_paths = self.coder.scan_paths(plan)
+        entry = self.code_cache.get(
+            plan, self.library_hash, self.include_hash, scan_paths)
+        if entry is None:
+            source = self.coder.plan_code(plan)
+            entry = self.code_cache.put(
+                plan, self.library_hash, self.include_hash, 
+                scan_paths, source)
+        return entry
+    
+    def _row_by_row(self):
+        """ Determines whether library operators process rows one by one.
+        
+        Evaluates the corresponding flag of included functions. The
+        library is loaded in a separate process unless queries are
+        executed in this process (libraries may crash).
+        
+        Returns:
+            True unless library operators produce array columns
+        """
+        if self.in_process:
+            try:
+                self.namespace = self._load_library()
+                return self.namespace['ROW_BY_ROW']
+            except Exception:
+                # Errors are reported when executing queries
+                return True
+        
+        code = self._library_code() + '\nprint(ROW_BY_ROW)'
+        with open(self.paths.code, 'w') as file:
+            file.write(code)
+        completed = subprocess.run(
+            [self.python_path, self.paths.code], 
+            capture_output=True, text=True)
+        if completed.returncode > 0:
+            # Errors are reported when executing queries
+            return True
+        return completed.stdout.split()[-1] == 'True'
+    
     def _run(self, code):
         """ Execute given Python code.
         
@@ -105,6 +310,28 @@ class DbzEngine(Engine):
             return False
         else:
             return True
+    
+    def _run_in_process(self, compiled, out):
+        """ Execute query code in namespace of pre-loaded library.
+        
+        Args:
+            compiled: compiled code executing query plan
+            out: name of file for query result
+        
+        Returns:
+            True iff execution succeeds
+        """
+        try:
+            if self.namespace is None:
+                self.namespace = self._load_library()
+            namespace = dict(self.namespace)
+            with contextlib.redirect_stdout(io.StringIO()):
+                exec(compiled, namespace)
+                namespace['write_to_csv'](namespace['last_result'], out)
+            return True
+        except Exception:
+            print(f'Error: {traceback.format_exc()}')
+            return False
 
 
 class PgEngine(Engine):
@@ -0,0 +1,97 @@
+'''
+Date functions for columns storing days since 1/1/1970.
+'''
+# Index of date fields in results of days_to_civil
+DATE_FIELDS = {'year':0, 'month':1, 'day':2}
+
+
+def days_to_civil(days):
+    """ Converts days since 1/1/1970 into year, month, and day.
+    
+    Uses integer arithmetic only (proleptic Gregorian calendar) and
+    works for single integers as well as for integer arrays.
+    
+    Args:
+        days: number of days since 1/1/1970 (integer or integer array)
+    
+    Returns:
+        tuple with year, month, and day
+    """
+    shifted = days + 719468
+    era = shifted // 146097
+    day_of_era = shifted - era * 146097
+    year_of_era = (
+        day_of_era - day_of_era // 1460 +
+        day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (
+        365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = shifted_month + 3 - 12 * (shifted_month >= 10)
+    year = year_of_era + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def format_date(days):
+    """ Formats date as string (YYYY-MM-DD).
+    
+    Args:
+        days: number of days since 1/1/1970
+    
+    Returns:
+        string representing date
+    """
+    year, month, day = days_to_civil(days)
+    return f'{year:04d}-{month:02d}-{day:02d}'
+
+
+def map_dates(column, date_fct):
+    """ Applies function to dates, evaluating it once per distinct date.
+    
+    Args:
+        column: a date column (days since 1/1/1970, None for NULL)
+        date_fct: function mapping a date to a value
+    
+    Returns:
+        column containing function results (None for NULL)
+    """
+    if isinstance(column, ConstantColumn):
+        value = column.value
+        value = None if value is None else date_fct(value)
+        return ConstantColumn(value, len(column))
+    
+    values = column_values(column)
+    value_map = {d:None if d is None else date_fct(d) for d in set(values)}
+    if ROW_BY_ROW:
+        return [value_map[d] for d in values]
+    else:
+        return map_column(values, value_map.__getitem__)
+
+
+def extract_from_dates(column, field):
+    """ Extracts year, month, or day from each date in column.
+    
+    Args:
+        column: a date column (days since 1/1/1970, None for NULL)
+        field: extract this field (year, month, or day)
+    
+    Returns:
+        column containing extracted integers
+    """
+    field_idx = DATE_FIELDS[field]
+    if hasattr(column, 'dtype') and column.dtype.kind in 'iu':
+        return days_to_civil(column)[field_idx]
+    else:
+        return map_dates(column, lambda d:days_to_civil(d)[field_idx])
+
+
+def format_dates(column):
+    """ Formats each date in column as string (YYYY-MM-DD).
+    
+    Args:
+        column: a date column (days since 1/1/1970, None for NULL)
+    
+    Returns:
+        column containing date strings
+    """
+    return map_dates(column, format_date)
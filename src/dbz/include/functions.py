@@ -3,6 +3,60 @@ Created on Mar 28, 2022
 
 @author: immanueltrummer
 '''
+# Set by long-lived engines to keep tables in memory across queries
+table_cache = None
+
+# Evaluate expressions row by row unless columns are arrays
+ROW_BY_ROW = not hasattr(fill_column(0, 1), 'dtype')
+
+
+class ConstantColumn():
+    """ Column with the same value in each row, stored only once. """
+    
+    def __init__(self, value, length):
+        """ Initializes column.
+        
+        Args:
+            value: value in each row
+            length: number of rows
+        """
+        self.value = value
+        self.length = length
+    
+    def __getitem__(self, index):
+        """ Returns value at index or list of values for slice. """
+        if isinstance(index, slice):
+            return [self.value] * len(range(self.length)[index])
+        elif -self.length <= index < self.length:
+            return self.value
+        else:
+            raise IndexError(f'Row index {index} out of range')
+    
+    def __iter__(self):
+        """ Iterates over column values. """
+        return itertools.repeat(self.value, self.length)
+    
+    def __len__(self):
+        """ Returns number of rows. """
+        return self.length
+
+
+def broadcast(value, length):
+    """ Returns column with constant value, avoiding per-row copies.
+    
+    Args:
+        value: value in each row
+        length: number of rows
+    
+    Returns:
+        constant column (filled array if columns are arrays)
+    """
+    if ROW_BY_ROW:
+        return ConstantColumn(value, length)
+    else:
+        return fill_column(value, length)
+
+
 def is_scalar(column):
     """ Returns true iff the column has one element.
     
@@ -30,7 +84,7 @@ def expand_to(col_or_const, length):
     """
     if is_scalar(col_or_const):
         value = get_value(col_or_const, 0)
-        return fill_column(value, length)
+        return broadcast(value, length)
     else:
         return col_or_const
 
@@ -45,6 +99,7 @@ def adjust_after_project(input_rel, output_rel):
     Returns:
         output relation with appropriate column height
     """
+    input_rel = [c for c in input_rel if c is not None]
     if input_rel:
         scale_to = nr_rows(input_rel[0])
         return [expand_to(c, scale_to) for c in output_rel]
@@ -81,42 +136,155 @@ def adjust_after_aggregate(output_rel, grouping):
     return adjusted
 
 
-def complete_outer(in_rows, side, nr_all_cols, inner_rows):
-    """ Complete result of inner into result of outer join.
+def table_width(path):
+    """ Returns number of columns of stored table.
     
     Args:
-        in_rows: rows of input relation
-        side: 0 if in_rows from left input, 1 otherwise
-        nr_all_cols: number of columns in join output
-        inner_rows: result of inner join
+        path: path to .csv file or directory containing table
     
     Returns:
-        rows completing result of inner join
+        number of table columns
     """
-    if not in_rows:
-        return []
+    if os.path.isdir(path):
+        with open(f'{path}/meta.json') as file:
+            return len(json.load(file)['columns'])
+    else:
+        with open(path) as file:
+            return len(next(csv.reader(file), []))
+
+
+def scan_table(path, col_idxs=None, ranges=None):
+    """ Loads table columns from disk or from table cache.
+    
+    Tables are either stored as .csv files or as directories
+    containing one file per column (binary columnar format).
+    Cached columns are shared across queries and returned without
+    copying. Lists are cached as tuples, so operators that modify
+    their input in place copy them first (see writable).
+    String columns with few distinct values are dictionary-
+    encoded if operators process columns row by row.
+    For the binary format, range predicates are used to skip
+    blocks of rows that cannot satisfy them (the result may
+    still contain rows that violate the predicates).
+    
+    Args:
+        path: path to .csv file or directory containing table
+        col_idxs: indexes of columns to load (all columns if None)
+        ranges: list of (column index, lower bound, upper bound)
+    
+    Returns:
+        list of table columns
+    """
+    def load_columns(path, col_idxs, ranges=None):
+        """ Loads columns in columnar format from given path. """
+        if os.path.isdir(path):
+            columns = load_binary(path, col_idxs, ranges=ranges)
+        else:
+            # Nullable types keep integer columns with NULL values integer
+            csv_data = pd.read_csv(
+                path, header=None, usecols=col_idxs,
+                dtype_backend='numpy_nullable')
+            csv_data.columns = range(len(col_idxs))
+            for col_idx in csv_data.columns:
+                values = csv_data[col_idx]
+                if values.hasnans or values.dtype.kind not in 'biuf':
+                    values = values.astype(object)
+                    csv_data[col_idx] = values.where(values.notna(), None)
+                else:
+                    csv_data[col_idx] = values.to_numpy(
+                        values.dtype.numpy_dtype)
+            columns = to_columnar_format(csv_data)
+        return [adapt_encoding(c) for c in columns]
+    
+    def load_shared(path, col_idxs):
+        """ Loads columns for table cache, making lists read-only. """
+        columns = load_columns(path, col_idxs)
+        return [tuple(c) if isinstance(c, list) else c for c in columns]
+    
+    if col_idxs is None:
+        col_idxs = list(range(table_width(path)))
+    
+    if table_cache is None:
+        return load_columns(path, col_idxs, ranges)
+    else:
+        table = table_cache.get(path, col_idxs, load_shared)
+        runs = None
+        if ranges and os.path.isdir(path):
+            runs = block_runs(path, ranges)
+        if runs is None:
+            return table
+        else:
+            return [select_rows(c, runs) for c in table]
+
+
+def adapt_encoding(column):
+    """ Dictionary-encodes or decodes column, depending on operators.
+    
+    Args:
+        column: a loaded table column
+    
+    Returns:
+        encoded column for operators processing rows one by one
+    """
+    if not ROW_BY_ROW:
+        if isinstance(column, DictionaryColumn):
+            return list(column)
+    elif isinstance(column, list):
+        encoded = dictionary_encode(column)
+        if encoded is not None:
+            return encoded
+    return column
+
+
+def column_codes(column):
+    """ Returns codes of encoded columns, otherwise column values.
+    
+    Args:
+        column: a column (possibly dictionary-encoded)
+    
+    Returns:
+        values that are equal iff (decoded) column values are equal
+    """
+    if isinstance(column, DictionaryColumn):
+        return column.codes
+    else:
+        return column_values(column)
+
+
+def restore_encoding(codes, column):
+    """ Restores encoding of values obtained via column_codes.
+    
+    Args:
+        codes: values obtained from given column via column_codes
+        column: source column (possibly dictionary-encoded)
+    
+    Returns:
+        codes as dictionary-encoded column if source column was encoded
+    """
+    if isinstance(column, DictionaryColumn):
+        return DictionaryColumn(codes, column.dictionary)
+    else:
+        return codes
+
+
+def writable(column):
+    """ Returns column that operators may modify in place.
     
-    nr_in_cols = len(in_rows[0])
-    nr_other_cols = nr_all_cols - nr_in_cols
-    matched = set()
-    for inner_row in inner_rows:
-        start_idx = 0 if side == 0 else nr_other_cols
-        ex_end_idx = nr_in_cols if side == 0 else nr_all_cols
-        inner_tuple = tuple(inner_row)
-        projected = inner_tuple[start_idx:ex_end_idx]
-        matched.add(projected)
+    Lists are returned as is. Arrays are copied, read-only sequences
+    (e.g., memory-mapped or cached columns) are copied into lists.
     
-    unmatched = set()
-    for in_row in in_rows:
-        in_tuple = tuple(in_row)
-        if in_tuple not in matched:
-            unmatched.add(in_tuple)
+    Args:
+        column: a column (list, array, or read-only sequence)
     
-    nulls = (None,) * nr_other_cols
-    if side == 0:
-        return [list(it + nulls) for it in unmatched]
+    Returns:
+        writable column
+    """
+    if isinstance(column, list):
+        return column
+    elif hasattr(column, 'dtype'):
+        return column.copy()
     else:
-        return [list(nulls + it) for it in unmatched]
+        return list(column)
 
 
 def smart_padding(operand, pad_to):
@@ -129,7 +297,16 @@ def smart_padding(operand, pad_to):
     Returns:
         padded operand
     """
-    return map_column(operand, lambda s:s.ljust(pad_to))
+    if isinstance(operand, DictionaryColumn):
+        dictionary = [
+            None if s is None else s.ljust(pad_to) 
+            for s in operand.dictionary]
+        # Dictionary entries must be unique (codes represent groups)
+        if len(set(dictionary)) == len(dictionary):
+            return DictionaryColumn(operand.codes, dictionary)
+        return [dictionary[c] for c in operand.codes]
+    return map_column(
+        operand, lambda s:None if s is None else s.ljust(pad_to))
 
 
 def prepare_aggregate(input_rel, op_cols, row_id_column, distinct):
@@ -183,14 +360,7 @@ def smart_date_extract(from_date, field):
     Returns:
         integer value representing extracted property
     """
-    def scalar_extract(from_date, field):
-        """ Extracts property from a scalar date (i.e., no column). """
-        return getattr(
-            datetime.datetime(1970,1,1) +\
-            datetime.timedelta(days=from_date), 
-            field)
-        
-    return map_column(from_date, lambda d: scalar_extract(d, field))
+    return extract_from_dates(from_date, field)
 
 
 def smart_substring(src, start, length):
@@ -207,7 +377,101 @@ def smart_substring(src, start, length):
     assert not is_scalar(src), 'Error - cannot extract from scalar source'
     assert is_scalar(start), 'Error - only scalar start indexes supported'
     assert is_scalar(length), 'Error - only scalar length values supported'
-    return substring(src, get_value(start, 0), get_value(length, 0))
+    return substring(writable(src), get_value(start, 0), get_value(length, 0))
+
+
+def column_values(column):
+    """ Returns column values for iteration in generated loops.
+    
+    Args:
+        column: a column (list or array)
+    
+    Returns:
+        column values as Python objects
+    """
+    if isinstance(column, DictionaryColumn):
+        return list(column)
+    return column.tolist() if hasattr(column, 'tolist') else column
+
+
+def match_like(column, kind, text):
+    """ Evaluates LIKE predicate on a string column.
+    
+    Args:
+        column: a string column
+        kind: prefix, suffix, contains, equals, or regex
+        text: test for this string (regular expression for regex)
+    
+    Returns:
+        Boolean column (NULL for NULL values)
+    """
+    if isinstance(column, DictionaryColumn):
+        # Evaluate on distinct values only
+        matches = match_like(column.dictionary, kind, text)
+        return [matches[c] for c in column.codes]
+    
+    values = column_values(column)
+    if kind == 'prefix':
+        return [None if s is None else s.startswith(text) for s in values]
+    elif kind == 'suffix':
+        return [None if s is None else s.endswith(text) for s in values]
+    elif kind == 'contains':
+        return [None if s is None else text in s for s in values]
+    elif kind == 'equals':
+        return [None if s is None else s == text for s in values]
+    else:
+        match = re.compile(text).fullmatch
+        return [None if s is None else match(s) is not None for s in values]
+
+
+def match_like_rows(column, patterns, escape=None):
+    """ Evaluates LIKE predicate with a pattern for each row.
+    
+    Args:
+        column: a string column
+        patterns: column with LIKE patterns
+        escape: characters after it are no wildcards (optional)
+    
+    Returns:
+        Boolean column (NULL for NULL values or patterns)
+    """
+    column, patterns = fix_rel([column, patterns])
+    matchers = {}
+    result = []
+    for value, pattern in zip(column_values(column), column_values(patterns)):
+        if value is None or pattern is None:
+            result += [None]
+            continue
+        match = matchers.get(pattern)
+        if match is None:
+            match = matchers[pattern] = re.compile(
+                like_regex(pattern, escape)).fullmatch
+        result += [match(value) is not None]
+    return result
+
+
+def like_regex(pattern, escape=None):
+    """ Translates LIKE pattern into a regular expression.
+    
+    Args:
+        pattern: LIKE pattern
+        escape: characters after it are no wildcards (optional)
+    
+    Returns:
+        regular expression matching the same strings
+    """
+    parts = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == escape:
+            parts += [re.escape(next(chars, ''))]
+        elif char == '%':
+            parts += ['.*']
+        elif char == '_':
+            parts += ['.']
+        else:
+            parts += [re.escape(char)]
+    return '(?s)' + ''.join(parts)
 
 
 def fix_rel(columns):
@@ -232,7 +496,7 @@ def fix_rel(columns):
         for col in columns:
             if nr_rows(col) < max_length:
                 value = get_value(col, 0)
-                col = fill_column(value, max_length)
+                col = broadcast(value, max_length)
             scaled_cols.append(col)
         return scaled_cols
     
@@ -251,5 +515,368 @@ def multiply_by_scalar(column, scalar):
         column resulting from multiplication
     """
     scale_to = nr_rows(column)
-    const_col = fill_column(scalar, scale_to)
-    return multiplication(column, const_col)
\ No newline at end of file
+    const_col = broadcast(scalar, scale_to)
+    return multiplication(column, const_col)
+
+
+def sort_key(column, descending, nulls_first):
+    """ Returns function extracting sort key for given row index.
+    
+    Args:
+        column: extract keys from this column
+        descending: whether rows are sorted in descending order
+        nulls_first: whether NULL values come before other values
+    
+    Returns:
+        function mapping row indexes to comparable keys
+    """
+    values = list(column)
+    if None not in values:
+        return values.__getitem__
+    
+    # NULL flag is compared before values (order is reversed if descending)
+    nulls_high = nulls_first == descending
+    return lambda i:((values[i] is None) == nulls_high, values[i])
+
+
+def sort_columns(columns, collation):
+    """ Sorts relation according to given sort columns.
+    
+    Sorts row indexes with one stable sort per sort column,
+    starting with the least significant one. Each sort extracts
+    keys from one column (no comparisons between entire rows).
+    
+    Args:
+        columns: list of columns to sort
+        collation: list of (column index, descending, nulls first)
+    
+    Returns:
+        list of sorted columns
+    """
+    if not columns:
+        return columns
+    
+    row_idxs = list(range(nr_rows(columns[0])))
+    for col_idx, descending, nulls_first in reversed(collation):
+        key = sort_key(columns[col_idx], descending, nulls_first)
+        row_idxs.sort(key=key, reverse=descending)
+    
+    rows = to_row_format(columns)
+    return rows_to_columns([rows[i] for i in row_idxs], len(columns))
+
+
+class DescendingKey():
+    """ Sort key that inverts the order of the wrapped key. """
+    
+    __slots__ = ['key']
+    
+    def __init__(self, key):
+        """ Initializes with given key.
+        
+        Args:
+            key: comparable key (sorted in ascending order)
+        """
+        self.key = key
+    
+    def __eq__(self, other):
+        """ Keys are equal iff wrapped keys are equal. """
+        return self.key == other.key
+    
+    def __lt__(self, other):
+        """ Keys are smaller iff wrapped keys are larger. """
+        return other.key < self.key
+
+
+def top_n_columns(columns, collation, limit):
+    """ Retrieves first rows according to given sort columns.
+    
+    Selects rows via a bounded heap on keys combining all sort
+    columns, so at most limit rows are kept. Ties are resolved
+    by row order, as for the stable sorts in sort_columns.
+    
+    Args:
+        columns: list of columns to sort
+        collation: list of (column index, descending, nulls first)
+        limit: maximal number of result rows
+    
+    Returns:
+        list of columns containing first rows in sort order
+    """
+    if not columns:
+        return columns
+    
+    all_idxs = range(nr_rows(columns[0]))
+    keys = []
+    for col_idx, descending, nulls_first in collation:
+        key = sort_key(columns[col_idx], descending, nulls_first)
+        if descending:
+            key = lambda i, key=key:DescendingKey(key(i))
+        keys += [key]
+    
+    if len(keys) == 1:
+        row_key = keys[0]
+    else:
+        row_key = lambda i:[key(i) for key in keys]
+    row_idxs = heapq.nsmallest(limit, all_idxs, key=row_key)
+    rows = [[get_value(c, i) for c in columns] for i in row_idxs]
+    return rows_to_columns(rows, len(columns))
+
+
+def cross_pairs(nr_left, nr_right):
+    """ Enumerates all pairs of rows (for joins without equality predicates).
+    
+    Args:
+        nr_left: number of rows in left input
+        nr_right: number of rows in right input
+    
+    Returns:
+        tuple with row indexes of left and right input for each pair
+    """
+    left_idxs = [i for i in range(nr_left) for _ in range(nr_right)]
+    right_idxs = list(range(nr_right)) * nr_left
+    return left_idxs, right_idxs
+
+
+def filter_pairs(left_idxs, right_idxs, row_idx):
+    """ Filters pairs of matching row indexes.
+    
+    Args:
+        left_idxs: row indexes in left join input
+        right_idxs: row indexes in right join input
+        row_idx: Boolean column, True for pairs to keep
+    
+    Returns:
+        tuple with filtered left and right row indexes
+    """
+    keep = [i for i, p in enumerate(row_idx) if p]
+    return [left_idxs[i] for i in keep], [right_idxs[i] for i in keep]
+
+
+def gather_column(column, row_idxs):
+    """ Retrieves column values at given row indexes.
+    
+    Args:
+        column: a column
+        row_idxs: list of row indexes (None to produce NULL values)
+    
+    Returns:
+        column (which is a list) with values at row indexes
+    """
+    if isinstance(column, DictionaryColumn):
+        codes = gather_column(column.codes, row_idxs)
+        dictionary = column.dictionary
+        if None in row_idxs:
+            # Dictionary entries must be unique (codes represent groups)
+            if None in dictionary:
+                null_code = dictionary.index(None)
+            else:
+                null_code = len(dictionary)
+                dictionary = dictionary + [None]
+            codes = [null_code if c is None else c for c in codes]
+        return DictionaryColumn(codes, dictionary)
+    elif None in row_idxs:
+        return [None if i is None else column[i] for i in row_idxs]
+    elif hasattr(column, 'take'):
+        # Gather within arrays (e.g., NumPy arrays) without conversion
+        return column.take(row_idxs)
+    else:
+        return [column[i] for i in row_idxs]
+
+
+def gather_columns(columns, row_idxs, col_idxs=None):
+    """ Retrieves values at given row indexes for each column.
+    
+    Args:
+        columns: list of columns
+        row_idxs: list of row indexes (None to produce NULL values)
+        col_idxs: indexes of columns to gather (None for all columns)
+    
+    Returns:
+        list of columns with values at row indexes (None if not gathered)
+    """
+    if col_idxs is None:
+        return [gather_column(c, row_idxs) for c in columns]
+    else:
+        return [
+            gather_column(c, row_idxs) if idx in col_idxs else None
+            for idx, c in enumerate(columns)]
+
+
+def selection_indexes(row_idx, selection, nr_input_rows):
+    """ Determines indexes of selected rows satisfying a predicate.
+    
+    Args:
+        row_idx: a column containing Booleans
+        selection: row indexes the predicate was evaluated on (or None)
+        nr_input_rows: number of input rows (before any selection)
+    
+    Returns:
+        list of row indexes for which row_idx is True
+    """
+    # Constant predicates yield one value for all rows
+    nr_evaluated = nr_input_rows if selection is None else len(selection)
+    row_idx = expand_to(row_idx, nr_evaluated)
+    if hasattr(row_idx, 'nonzero'):
+        # Indexes of True entries within arrays (e.g., NumPy arrays)
+        row_idxs = row_idx.nonzero()[0]
+        if selection is None:
+            return row_idxs
+        else:
+            return gather_column(selection, row_idxs)
+    elif selection is None:
+        return [i for i, p in enumerate(row_idx) if p]
+    else:
+        return [i for i, p in zip(selection, row_idx) if p]
+
+
+def exclude_indexes(selection, excluded, nr_rows):
+    """ Removes row indexes from a selection vector.
+    
+    Args:
+        selection: list of selected row indexes (None for all rows)
+        excluded: list of row index lists to remove
+        nr_rows: number of rows (used if all rows are selected)
+    
+    Returns:
+        list of selected row indexes that are not excluded
+    """
+    if selection is None:
+        selection = range(nr_rows)
+    excluded = {i for row_idxs in excluded for i in row_idxs}
+    return [i for i in selection if i not in excluded]
+
+
+def union_indexes(selections):
+    """ Merges disjoint selection vectors.
+    
+    Args:
+        selections: list of row index lists without shared indexes
+    
+    Returns:
+        sorted list of row indexes in any of the selections
+    """
+    return sorted(i for row_idxs in selections for i in row_idxs)
+
+
+def join_indexes(left_keys, right_keys):
+    """ Determines pairs of rows with equal join keys.
+    
+    Builds a hash table mapping key values to row indexes in the
+    smaller input and probes it with keys from the other input. Rows
+    with NULL values in join keys have no join partners.
+    
+    Args:
+        left_keys: list of key columns from left input
+        right_keys: list of key columns from right input
+    
+    Returns:
+        tuple with row indexes of left and right input for each pair
+    """
+    if len(left_keys) == 1:
+        left_values = left_keys[0]
+        right_values = right_keys[0]
+        is_valid = lambda key:key is not None
+    else:
+        left_values = list(zip(*left_keys))
+        right_values = list(zip(*right_keys))
+        is_valid = lambda key:None not in key
+    
+    build_left = nr_rows(left_values) < nr_rows(right_values)
+    if build_left:
+        build_values, probe_values = left_values, right_values
+    else:
+        build_values, probe_values = right_values, left_values
+    
+    hash_table = {}
+    for row_idx, key in enumerate(build_values):
+        if key in hash_table:
+            hash_table[key].append(row_idx)
+        elif is_valid(key):
+            hash_table[key] = [row_idx]
+    
+    build_idxs = []
+    probe_idxs = []
+    for row_idx, key in enumerate(probe_values):
+        matches = hash_table.get(key, None)
+        if matches is not None:
+            probe_idxs += [row_idx] * len(matches)
+            build_idxs += matches
+    
+    if build_left:
+        return build_idxs, probe_idxs
+    else:
+        return probe_idxs, build_idxs
+
+
+def matched_rows(left_idxs, nr_left, anti):
+    """ Determines rows of left input with or without join partner.
+    
+    Args:
+        left_idxs: row indexes in left input of matching pairs
+        nr_left: number of rows in left input
+        anti: whether to return rows without join partner
+    
+    Returns:
+        list of row indexes in left input (in ascending order)
+    """
+    matched = set(left_idxs)
+    return [i for i in range(nr_left) if (i in matched) != anti]
+
+
+def outer_pairs(left_idxs, right_idxs, nr_left, nr_right, keep_left, keep_right):
+    """ Adds pairs for rows without join partner (for outer joins).
+    
+    Args:
+        left_idxs: row indexes in left input of matching pairs
+        right_idxs: row indexes in right input of matching pairs
+        nr_left: number of rows in left input
+        nr_right: number of rows in right input
+        keep_left: whether to add left rows without join partner
+        keep_right: whether to add right rows without join partner
+    
+    Returns:
+        tuple with row indexes (None for missing join partners)
+    """
+    left_idxs = list(left_idxs)
+    right_idxs = list(right_idxs)
+    if keep_left:
+        matched = set(left_idxs)
+        unmatched = [i for i in range(nr_left) if i not in matched]
+        left_idxs += unmatched
+        right_idxs += [None] * len(unmatched)
+    if keep_right:
+        matched = set(right_idxs)
+        unmatched = [i for i in range(nr_right) if i not in matched]
+        left_idxs += [None] * len(unmatched)
+        right_idxs += unmatched
+    return left_idxs, right_idxs
+
+
+def semi_join_indexes(left_keys, right_keys, anti):
+    """ Determines rows of left input with or without join partner.
+    
+    Only tests whether left keys appear in the set of right keys,
+    without enumerating matching pairs. Rows with NULL values in
+    join keys have no join partners.
+    
+    Args:
+        left_keys: list of key columns from left input
+        right_keys: list of key columns from right input
+        anti: whether to return rows without join partner
+    
+    Returns:
+        list of row indexes in left input (in ascending order)
+    """
+    if len(left_keys) == 1:
+        left_values = left_keys[0]
+        right_values = right_keys[0]
+    else:
+        left_values = zip(*left_keys)
+        right_values = zip(*right_keys)
+    
+    key_set = set(right_values)
+    key_set.discard(None)
+    if len(right_keys) > 1:
+        key_set = {k for k in key_set if None not in k}
+    
+    return [i for i, k in enumerate(left_values) if (k in key_set) != anti]
@@ -3,5 +3,11 @@ Created on Mar 29, 2022
 
 @author: immanueltrummer
 '''
+import csv
 import datetime
+import heapq
+import itertools
+import json
+import os
+import pandas as pd
 import re
\ No newline at end of file
@@ -0,0 +1,370 @@
+'''
+Binary columnar table storage, with separate files for each column.
+'''
+import array
+import json
+import mmap
+import os
+import shutil
+import sys
+
+BLOCK_SIZE = 16384
+DICTIONARY_LIMIT = 65536
+
+
+class DictionaryColumn():
+    """ String column represented as codes, referring to distinct values.
+    
+    The column behaves like a sequence of (decoded) values. Helper
+    functions that are aware of the encoding process codes instead.
+    """
+    
+    def __init__(self, codes, dictionary):
+        """ Initializes column.
+        
+        Args:
+            codes: sequence of integer codes (indexes into dictionary)
+            dictionary: list of distinct values (None representing NULL)
+        """
+        self.codes = codes
+        self.dictionary = dictionary
+    
+    def __getitem__(self, index):
+        """ Returns value at index or encoded column for slice. """
+        if isinstance(index, slice):
+            return DictionaryColumn(self.codes[index], self.dictionary)
+        else:
+            return self.dictionary[self.codes[index]]
+    
+    def __iter__(self):
+        """ Iterates over decoded column values. """
+        return map(self.dictionary.__getitem__, self.codes)
+    
+    def __len__(self):
+        """ Returns number of rows. """
+        return len(self.codes)
+
+
+def column_kind(column):
+    """ Determines storage format for column values.
+    
+    Args:
+        column: a column (list of values, None representing NULL)
+    
+    Returns:
+        "int" (64 bit integers), "float" (64 bit floats), or "str"
+    """
+    values = [v for v in column if v is not None]
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return 'int'
+    elif all(isinstance(v, (int, float)) for v in values):
+        return 'float'
+    else:
+        return 'str'
+
+
+def block_runs(table_dir, ranges):
+    """ Determines row ranges that may satisfy range predicates.
+    
+    Uses zone maps (minimum and maximum per block of rows) to exclude
+    blocks whose values cannot satisfy the predicates. Blocks are only
+    excluded if that is safe, rows in remaining blocks still need to
+    be filtered.
+    
+    Args:
+        table_dir: directory containing table in binary format
+        ranges: list of (column index, lower bound, upper bound) with
+                inclusive bounds (None if unbounded)
+    
+    Returns:
+        list of (start, end) row ranges or None if no block is excluded
+    """
+    with open(f'{table_dir}/meta.json') as file:
+        meta = json.load(file)
+    
+    nr_rows = meta['nr_rows']
+    block_size = meta.get('block_size', BLOCK_SIZE)
+    nr_blocks = (nr_rows + block_size - 1) // block_size
+    keep = [True] * nr_blocks
+    for col_idx, lower, upper in ranges:
+        zones = meta['columns'][col_idx].get('zones', None)
+        if zones is None:
+            continue
+        for block_idx, (min_val, max_val) in enumerate(zones):
+            if min_val is None or \
+                (lower is not None and max_val < lower) or \
+                (upper is not None and min_val > upper):
+                keep[block_idx] = False
+    
+    if all(keep):
+        return None
+    
+    runs = []
+    for block_idx in range(nr_blocks):
+        if keep[block_idx]:
+            start = block_idx * block_size
+            end = min(start + block_size, nr_rows)
+            if runs and runs[-1][1] == start:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs += [(start, end)]
+    return runs
+
+
+def select_rows(column, runs):
+    """ Selects given row ranges from column.
+    
+    Args:
+        column: a column (list or memoryview)
+        runs: list of (start, end) row ranges
+    
+    Returns:
+        new list or (for single range) memoryview slice with selected rows
+    """
+    if len(runs) == 1 and not isinstance(column, list):
+        start, end = runs[0]
+        return column[start:end]
+    else:
+        return [v for start, end in runs for v in column[start:end]]
+
+
+def write_binary(columns, table_dir, block_size=BLOCK_SIZE):
+    """ Writes table in binary columnar format into given directory.
+    
+    Each column is stored in separate files. Integer and float columns
+    are stored as arrays of fixed-width values. String columns are stored
+    as concatenated UTF-8 text together with an array of (character)
+    offsets marking where each value starts. String columns with few
+    distinct values are stored as arrays of codes instead, referring
+    to a dictionary of distinct values (stored in meta.json). Other
+    columns with NULL values have an additional file with one byte
+    per row (1 for NULL values).
+    File meta.json stores number of rows and column formats. For integer
+    and float columns, it also stores zone maps: minimum and maximum
+    value for each block of rows (None for blocks with only NULLs).
+    
+    Args:
+        columns: list of table columns (lists of values)
+        table_dir: write table into this directory (replacing content)
+        block_size: number of rows per block in zone maps
+    """
+    if os.path.exists(table_dir):
+        shutil.rmtree(table_dir)
+    os.makedirs(table_dir)
+    
+    nr_rows = len(columns[0]) if columns else 0
+    col_metas = []
+    for col_idx, column in enumerate(columns):
+        kind = column_kind(column)
+        nulls = [v is None for v in column]
+        has_nulls = any(nulls)
+        col_meta = {'kind':kind, 'nulls':has_nulls}
+        if kind != 'str':
+            col_meta['zones'] = _zone_map(column, block_size)
+        col_metas += [col_meta]
+        
+        col_path = f'{table_dir}/{col_idx}'
+        encoded = dictionary_encode(column) if kind == 'str' else None
+        if encoded is not None:
+            col_meta.update(
+                {'kind':'dict', 'nulls':False, 
+                 'dictionary':encoded.dictionary})
+            codes = array.array('i', encoded.codes)
+            with open(f'{col_path}.bin', 'wb') as file:
+                codes.tofile(file)
+            continue
+        elif kind == 'str':
+            values = ['' if v is None else str(v) for v in column]
+            offsets = array.array('q', [0])
+            for value in values:
+                offsets.append(offsets[-1] + len(value))
+            with open(f'{col_path}.off', 'wb') as file:
+                offsets.tofile(file)
+            with open(f'{col_path}.bin', 'wb') as file:
+                file.write(''.join(values).encode('utf-8'))
+        else:
+            typecode = 'q' if kind == 'int' else 'd'
+            values = [0 if v is None else v for v in column]
+            values = array.array(typecode, values)
+            with open(f'{col_path}.bin', 'wb') as file:
+                values.tofile(file)
+        
+        if has_nulls:
+            with open(f'{col_path}.nul', 'wb') as file:
+                file.write(bytes(nulls))
+    
+    with open(f'{table_dir}/meta.json', 'w') as file:
+        json.dump({
+            'nr_rows':nr_rows, 'block_size':block_size,
+            'columns':col_metas}, file)
+
+
+def dictionary_encode(column):
+    """ Encodes column with few distinct strings via a dictionary.
+    
+    NaN values (representing NULL in string columns loaded from
+    .csv files) are encoded as NULL values.
+    
+    Args:
+        column: a column (list of values, None representing NULL)
+    
+    Returns:
+        dictionary-encoded column or None if encoding is not beneficial
+    """
+    # Check type before hashing all values of non-string columns
+    for value in column:
+        if isinstance(value, str):
+            break
+        elif not is_missing(value):
+            return None
+    else:
+        return None
+    
+    # Stop hashing once there are too many distinct values
+    limit = min(DICTIONARY_LIMIT, len(column) // 2)
+    distinct = set()
+    for start in range(0, len(column), BLOCK_SIZE):
+        distinct.update(column[start:start + BLOCK_SIZE])
+        if len(distinct) > limit:
+            return None
+    values = [v for v in distinct if not is_missing(v)]
+    if not all(isinstance(v, str) for v in values):
+        return None
+    
+    dictionary = [sys.intern(v) for v in sorted(values)]
+    code_of = {v:code for code, v in enumerate(dictionary)}
+    nulls = [v for v in distinct if is_missing(v)]
+    if nulls:
+        code_of.update({v:len(dictionary) for v in nulls})
+        dictionary += [None]
+    codes = [code_of[v] for v in column]
+    return DictionaryColumn(codes, dictionary)
+
+
+def is_missing(value):
+    """ Returns true iff value represents NULL (None or NaN).
+    
+    Args:
+        value: a column value
+    
+    Returns:
+        true iff value is None or NaN
+    """
+    return value is None or value != value
+
+
+def map_values(path, typecode):
+    """ Maps file with fixed-width values into memory (without copying).
+    
+    Args:
+        path: path to file containing array of fixed-width values
+        typecode: type code of values (as for the array module)
+    
+    Returns:
+        read-only memoryview on values (pages are loaded on access)
+    """
+    if os.path.getsize(path) == 0:
+        return []
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+def load_binary(table_dir, col_idxs=None, mapped=True, ranges=None):
+    """ Loads table stored in binary columnar format.
+    
+    Fixed-width columns without NULL values (including codes of
+    dictionary-encoded columns) are memory-mapped if activated. Those
+    columns are read-only memoryviews, only pages that are accessed
+    are read, and processes mapping the same file share one physical
+    copy. Other columns are loaded into lists.
+    If range predicates are specified, blocks of rows that cannot
+    satisfy them (according to zone maps) are skipped.
+    
+    Args:
+        table_dir: directory containing table files
+        col_idxs: indexes of columns to load (all columns if None)
+        mapped: whether to memory-map fixed-width columns
+        ranges: optional range predicates (see block_runs)
+    
+    Returns:
+        list of table columns (lists, memoryviews, or encoded columns)
+    """
+    with open(f'{table_dir}/meta.json') as file:
+        meta = json.load(file)
+    
+    if col_idxs is None:
+        col_idxs = range(len(meta['columns']))
+    runs = block_runs(table_dir, ranges) if ranges else None
+    
+    columns = []
+    for col_idx in col_idxs:
+        col_meta = meta['columns'][col_idx]
+        col_path = f'{table_dir}/{col_idx}'
+        if col_meta['kind'] == 'str':
+            offsets = array.array('q')
+            with open(f'{col_path}.off', 'rb') as file:
+                offsets.frombytes(file.read())
+            with open(f'{col_path}.bin', 'rb') as file:
+                text = file.read().decode('utf-8')
+            row_runs = [(0, len(offsets)-1)] if runs is None else runs
+            column = [
+                text[offsets[i]:offsets[i+1]]
+                for start, end in row_runs for i in range(start, end)]
+        elif col_meta['kind'] == 'dict':
+            if mapped:
+                codes = map_values(f'{col_path}.bin', 'i')
+            else:
+                codes = array.array('i')
+                with open(f'{col_path}.bin', 'rb') as file:
+                    codes.frombytes(file.read())
+                codes = codes.tolist()
+            if runs is not None:
+                codes = select_rows(codes, runs)
+            dictionary = [
+                v if v is None else sys.intern(v) 
+                for v in col_meta['dictionary']]
+            column = DictionaryColumn(codes, dictionary)
+        elif mapped and not col_meta['nulls']:
+            typecode = 'q' if col_meta['kind'] == 'int' else 'd'
+            column = map_values(f'{col_path}.bin', typecode)
+        else:
+            typecode = 'q' if col_meta['kind'] == 'int' else 'd'
+            values = array.array(typecode)
+            with open(f'{col_path}.bin', 'rb') as file:
+                values.frombytes(file.read())
+            column = values.tolist()
+        
+        if runs is not None and col_meta['kind'] not in ['str', 'dict']:
+            column = select_rows(column, runs)
+        
+        if col_meta['nulls']:
+            with open(f'{col_path}.nul', 'rb') as file:
+                nulls = file.read()
+            if runs is not None:
+                nulls = select_rows(nulls, runs)
+            column = [None if n else v for v, n in zip(column, nulls)]
+        
+        columns += [column]
+    
+    return columns
+
+
+def _zone_map(column, block_size):
+    """ Calculates minimum and maximum value for each block of rows.
+    
+    Args:
+        column: a numerical column (list of values, None representing NULL)
+        block_size: number of rows per block
+    
+    Returns:
+        list of [minimum, maximum] pairs (None for blocks with only NULLs)
+    """
+    zones = []
+    for start in range(0, len(column), block_size):
+        values = [v for v in column[start:start+block_size] if v is not None]
+        if values:
+            zones += [[min(values), max(values)]]
+        else:
+            zones += [[None, None]]
+    return zones
@@ -0,0 +1,94 @@
+/*
+ * Serves query plans from one long-running JVM, avoiding JVM start-up,
+ * class loading, and JIT warm-up for each query. The service invokes
+ * the main class of Planner.jar for each request and listens on a Unix
+ * domain socket. Planner.jar exposes no entry point other than its main
+ * method, so the schema file is still read and parsed for each request.
+ *
+ * Run in source-file mode (Java 16 or later) with Planner.jar on the
+ * class path:
+ *
+ *   java -cp jars/Planner.jar src/dbz/java/PlannerService.java <socket>
+ *
+ * Protocol (one request per connection): the client sends the path of
+ * the schema file as first line, followed by the SQL query, and closes
+ * its output. The service replies with "ok" as first line, followed by
+ * the query plan in JSON, or with "error", followed by an error message.
+ */
+import java.io.File;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.StandardProtocolFamily;
+import java.net.UnixDomainSocketAddress;
+import java.nio.channels.Channels;
+import java.nio.channels.ServerSocketChannel;
+import java.nio.channels.SocketChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.util.jar.JarFile;
+
+public class PlannerService {
+
+    public static void main(String[] args) throws Exception {
+        Path socketPath = Path.of(args[0]);
+        Method plannerMain = plannerMain();
+        Path tmpDir = Files.createTempDirectory("planner");
+        Files.deleteIfExists(socketPath);
+        try (ServerSocketChannel server = ServerSocketChannel.open(
+                StandardProtocolFamily.UNIX)) {
+            server.bind(UnixDomainSocketAddress.of(socketPath));
+            while (true) {
+                try (SocketChannel client = server.accept()) {
+                    serve(client, plannerMain, tmpDir);
+                } catch (IOException e) {
+                    System.err.println("Planner service: " + e);
+                }
+            }
+        }
+    }
+
+    /* Returns main method of the planner, read from the jar manifest. */
+    static Method plannerMain() throws Exception {
+        String classPath = System.getProperty("java.class.path");
+        String jarPath = classPath.split(File.pathSeparator)[0];
+        try (JarFile jar = new JarFile(jarPath)) {
+            String mainClass = jar.getManifest().getMainAttributes()
+                .getValue("Main-Class");
+            return Class.forName(mainClass).getMethod("main", String[].class);
+        }
+    }
+
+    /* Plans the query received from the client and sends the reply. */
+    static void serve(SocketChannel client, Method plannerMain, Path tmpDir)
+            throws IOException {
+        InputStream in = Channels.newInputStream(client);
+        String request = new String(in.readAllBytes(), StandardCharsets.UTF_8);
+        String reply;
+        try {
+            int split = request.indexOf('\n');
+            if (split < 0) {
+                throw new IllegalArgumentException("Malformed request");
+            }
+            String schema = request.substring(0, split);
+            Path queryFile = tmpDir.resolve("query.sql");
+            Path planFile = tmpDir.resolve("plan.json");
+            Files.writeString(queryFile, request.substring(split + 1));
+            Files.deleteIfExists(planFile);
+            String[] plannerArgs = new String[] {
+                schema, queryFile.toString(), planFile.toString()};
+            plannerMain.invoke(null, (Object) plannerArgs);
+            reply = "ok\n" + Files.readString(planFile);
+        } catch (Exception e) {
+            Throwable cause = e instanceof InvocationTargetException ?
+                e.getCause() : e;
+            reply = "error\n" + cause;
+        }
+        OutputStream out = Channels.newOutputStream(client);
+        out.write(reply.getBytes(StandardCharsets.UTF_8));
+        out.flush();
+    }
+}
@@ -3,27 +3,180 @@ Created on Mar 6, 2022
 
 @author: immanueltrummer
 '''
+import dbz.query
+import dbz.util
+import hashlib
 import json
+import os
+import socket
 import subprocess
+import time
+
+
+class PlanCache():
+    """ Caches query plans, keyed by query text and database schema. """
+    
+    def __init__(self, schema_path, capacity=1000, cache_dir=None):
+        """ Initializes cache for plans referring to given schema.
+        
+        Args:
+            schema_path: path to database schema file
+            capacity: maximal number of cached plans (in memory and on disk)
+            cache_dir: directory for storing plans on disk (optional)
+        """
+        self.schema_path = schema_path
+        self.capacity = capacity
+        self.cache_dir = cache_dir
+        self.plans = dbz.util.LruCache(capacity)
+        self.schema_stat = None
+        self.schema_hash = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def get(self, sql):
+        """ Retrieves cached plan for given query.
+        
+        Args:
+            sql: retrieve plan for this SQL query
+        
+        Returns:
+            query plan in JSON representation or None if not cached
+        """
+        key = self._key(sql)
+        plan_json = self.plans.get(key)
+        if plan_json is None and self.cache_dir is not None:
+            plan_path = self._plan_path(key)
+            if os.path.exists(plan_path):
+                with open(plan_path) as file:
+                    plan_json = file.read()
+                os.utime(plan_path)
+                self.plans.put(key, plan_json)
+        return None if plan_json is None else json.loads(plan_json)
+    
+    def put(self, sql, plan):
+        """ Adds plan for given query to cache.
+        
+        Args:
+            sql: SQL query
+            plan: query plan in JSON representation
+        """
+        key = self._key(sql)
+        plan_json = json.dumps(plan)
+        self.plans.put(key, plan_json)
+        if self.cache_dir is not None:
+            with open(self._plan_path(key), 'w') as file:
+                file.write(plan_json)
+            self._evict_files(lambda name:False)
+    
+    def _check_schema(self):
+        """ Updates schema hash and drops plans if schema changed. """
+        stat = os.stat(self.schema_path)
+        schema_stat = (stat.st_mtime_ns, stat.st_size)
+        if schema_stat != self.schema_stat:
+            with open(self.schema_path, 'rb') as file:
+                schema_hash = hashlib.sha256(file.read()).hexdigest()[:16]
+            if schema_hash != self.schema_hash:
+                self.plans.clear()
+                if self.cache_dir is not None:
+                    self._evict_files(
+                        lambda name:not name.startswith(schema_hash))
+            self.schema_stat = schema_stat
+            self.schema_hash = schema_hash
+    
+    def _evict_files(self, is_stale):
+        """ Removes stale plan files and enforces capacity on disk.
+        
+        Args:
+            is_stale: function returning True for stale file names
+        """
+        names = [n for n in os.listdir(self.cache_dir) if n.endswith('.json')]
+        paths = [f'{self.cache_dir}/{n}' for n in names]
+        stale = [f'{self.cache_dir}/{n}' for n in names if is_stale(n)]
+        for path in stale:
+            os.remove(path)
+        
+        paths = [p for p in paths if p not in stale]
+        if len(paths) > self.capacity:
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths)-self.capacity]:
+                os.remove(path)
+    
+    def _key(self, sql):
+        """ Calculates cache key for given query.
+        
+        Args:
+            sql: calculate key for this SQL query
+        
+        Returns:
+            key combining hashes of schema and normalized query
+        """
+        self._check_schema()
+        normalized = dbz.query.normalize(sql)
+        sql_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f'{self.schema_hash}_{sql_hash}'
+    
+    def _plan_path(self, key):
+        """ Returns path of file storing plan with given key. """
+        return f'{self.cache_dir}/{key}.json'
+
 
 class Planner():
     """ Generates JSON plan using Apache Calcite. """
     
-    def __init__(self, schema_path, jar_path, tmp_dir):
+    def __init__(
+            self, schema_path, jar_path, tmp_dir, 
+            socket_path=None, cache=None, timeout_s=30):
         """ Initialize with given path to Calcite planner.
         
         Args:
             schema_path: path to database schema file
             jar_path: path to .jar file from Apache Calcite
             tmp_dir: use this directory for temporary files
+            socket_path: path to socket of planner service (optional)
+            cache: cache for previously generated plans (optional)
+            timeout_s: wait at most so many seconds for planner service
         """
         self.schema_path = schema_path
         self.jar_path = jar_path
         self.tmp_dir = tmp_dir
+        self.socket_path = socket_path
+        self.cache = cache
+        self.timeout_s = timeout_s
     
     def plan(self, sql):
         """ Invoke Calcite planner and generate plan.
         
+        Returns cached plans if available. Otherwise, uses the
+        planner service if it is running and falls back to invoking
+        the planner .jar file otherwise.
+        
+        Args:
+            sql: generate plan for this SQL query
+        
+        Returns:
+            query plan in JSON representation
+        """
+        if self.cache is not None:
+            plan = self.cache.get(sql)
+            if plan is not None:
+                return plan
+        
+        plan = None
+        if self.socket_path and os.path.exists(self.socket_path):
+            try:
+                plan = self._plan_remote(sql)
+            except (socket.timeout, OSError, ValueError) as e:
+                print(f'Planner service unavailable ({e}) - using .jar')
+        if plan is None:
+            plan = self._plan_local(sql)
+        
+        if self.cache is not None:
+            self.cache.put(sql, plan)
+        return plan
+    
+    def _plan_local(self, sql):
+        """ Generate plan by starting planner in a new JVM.
+        
         Args:
             sql: generate plan for this SQL query
         
@@ -43,4 +196,88 @@ class Planner():
             error_msg = completed.stderr
             raise Exception(f'Error: {error_msg}; Query: {sql}')
         with open(plan_file) as file:
-            return json.load(file)
\ No newline at end of file
+            return json.load(file)
+    
+    def _plan_remote(self, sql):
+        """ Request plan from long-running planner service.
+        
+        The service (see PlannerService) listens on a Unix domain
+        socket. A request consists of the schema path in the first
+        line, followed by the query. The reply starts with a line
+        containing "ok" or "error", followed by the query plan or by
+        an error message.
+        
+        Args:
+            sql: generate plan for this SQL query
+        
+        Returns:
+            query plan in JSON representation
+        """
+        request = f'{self.schema_path}\n{sql}'
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout_s)
+            sock.connect(self.socket_path)
+            sock.sendall(request.encode('utf-8'))
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile(encoding='utf-8') as reader:
+                status = reader.readline().strip()
+                content = reader.read()
+        if status == 'error':
+            raise Exception(f'Error: {content}; Query: {sql}')
+        elif status != 'ok':
+            raise ValueError(f'Malformed reply from planner: {status}')
+        return json.loads(content)
+
+
+class PlannerService():
+    """ Runs planner in one long-running JVM, serving plans via socket.
+    
+    The service avoids starting a JVM per query. It still parses the
+    schema for each query since the planner is invoked via its main
+    method (Planner.jar exposes no other entry point).
+    """
+    
+    def __init__(self, jar_path, source_path, socket_path):
+        """ Initializes service (without starting it).
+        
+        Args:
+            jar_path: path to .jar file from Apache Calcite
+            source_path: path to Java source of service
+            socket_path: service listens on socket at this path
+        """
+        self.jar_path = jar_path
+        self.source_path = source_path
+        self.socket_path = socket_path
+        self.process = None
+    
+    def start(self, timeout_s=60):
+        """ Starts service and waits until it accepts requests.
+        
+        Args:
+            timeout_s: wait at most so many seconds for service start
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        self.process = subprocess.Popen([
+            'java', '-cp', self.jar_path, 
+            self.source_path, self.socket_path])
+        deadline = time.time() + timeout_s
+        while not os.path.exists(self.socket_path):
+            if self.process.poll() is not None:
+                code = self.process.returncode
+                self.process = None
+                raise Exception(f'Planner service exited with code {code}')
+            if time.time() > deadline:
+                self.stop()
+                raise Exception('Planner service did not start in time')
+            time.sleep(0.1)
+    
+    def stop(self):
+        """ Stops service and removes its socket. """
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
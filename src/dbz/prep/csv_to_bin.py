@@ -0,0 +1,26 @@
+'''
+Converts .csv files in a data directory into binary columnar tables.
+'''
+import argparse
+import dbz.include.storage
+import os
+import pandas as pd
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_dir', type=str, help='Directory with .csv files')
+    args = parser.parse_args()
+    
+    file_names = os.listdir(args.data_dir)
+    for file_name in file_names:
+        in_path = f'{args.data_dir}/{file_name}'
+        if file_name.endswith('.csv'):
+            print(f'Processing file {file_name} ...')
+            # Nullable types keep integer columns with NULL values integer
+            df = pd.read_csv(
+                in_path, header=None, dtype_backend='numpy_nullable')
+            df = df.astype(object).where(df.notna(), None)
+            columns = [df[c].tolist() for c in df.columns]
+            out_dir = f'{args.data_dir}/{file_name[:-4]}'
+            dbz.include.storage.write_binary(columns, out_dir)
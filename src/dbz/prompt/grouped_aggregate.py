@@ -4,9 +4,10 @@ import os
 def per_group_<aggregate>(agg_column, group_id_column):
     """ Calculate <aggregate> for each group.
     
-    1. Collect values for each group.
-    2. Calculate <aggregate> for each group.
-    3. Return dictionary mapping each group ID to the <aggregate>.
+    1. Update a running <aggregate> for each group, row by row
+       (for averages, a running sum and a running count).
+       Do not collect the values of each group into lists.
+    2. Return dictionary mapping each group ID to the <aggregate>.
     
     Args:
         agg_column: the column <DataInstructions>. It contains values to <aggregate>.
@@ -4,9 +4,9 @@ import os
 def per_group_row_count(column, group_id_column):
     """ Calculate row count for each group.
     
-    1. Collect values for each group.
-    2. Calculate row count for each group.
-    3. Return dictionary mapping each group ID to the row count.
+    1. Increment a counter for each group, row by row.
+       Do not collect the values of each group into lists.
+    2. Return dictionary mapping each group ID to the row count.
     
     Args:
         column: the column <DataInstructions>. 
@@ -40,6 +40,26 @@ def load_queries(query_path):
     queries = [clean(q) for q in queries]
     return [q for q in queries if q]
 
+def normalize(query):
+    """ Normalizes query text for comparisons between queries.
+    
+    Collapses whitespace and changes case outside of quotes.
+    
+    Args:
+        query: an SQL query
+    
+    Returns:
+        normalized query text
+    """
+    parts = re.split(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")", query)
+    normalized = []
+    for idx, part in enumerate(parts):
+        if idx % 2:
+            normalized += [part]
+        else:
+            normalized += [re.sub(r'\s+', ' ', part).lower()]
+    return ''.join(normalized).strip().rstrip(';').strip()
+
 def plus_or_minus(operand1, operator, operand2):
     """ Auxiliary function for addition or subtraction.
     
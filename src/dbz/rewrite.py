@@ -0,0 +1,291 @@
+'''
+Created on Apr 6, 2022
+
+@author: immanueltrummer
+'''
+import copy
+import dbz.util
+import fractions
+import math
+
+
+def detect_anti_joins(plan):
+    """ Replaces left outer joins followed by IS NULL filters by anti joins.
+    
+    Considers filters on the output of left outer joins that require
+    a column of the right input to be NULL. If the column appears in
+    an equality predicate of the join condition, only left rows
+    without join partner satisfy the filter. The join is replaced
+    by an anti join that pads results with NULL values for the right
+    input (the filter is kept).
+    
+    Args:
+        plan: query plan in JSON (not changed)
+    
+    Returns:
+        query plan with anti joins
+    """
+    plan = copy.deepcopy(plan)
+    steps = plan['rels']
+    id_to_step = {step['id']:step for step in steps}
+    for step in steps:
+        if step['relOp'] == 'LogicalFilter' and len(step['inputs']) == 1:
+            join = id_to_step[step['inputs'][0]]
+            if join['relOp'] == 'LogicalJoin' and \
+                join['joinType'] == 'left' and \
+                'outputType' in id_to_step[join['inputs'][0]]:
+                left_width = _arity(id_to_step[join['inputs'][0]])
+                key_cols = set()
+                for pred in dbz.util.get_conjuncts(join['condition']):
+                    if pred.get('op', {}).get('kind') == 'EQUALS':
+                        key_cols.update(
+                            op['input'] for op in pred['operands'] 
+                            if 'input' in op)
+                for pred in dbz.util.get_conjuncts(step['condition']):
+                    if pred.get('op', {}).get('kind') == 'IS_NULL':
+                        operand = pred['operands'][0]
+                        if 'input' in operand and \
+                            operand['input'] >= left_width and \
+                            operand['input'] in key_cols:
+                            join['joinType'] = 'anti'
+                            join['nullPadding'] = True
+    return plan
+
+
+def prune_columns(plan):
+    """ Removes columns from query plan that are never used.
+    
+    Determines for each plan step which output columns are used by
+    later steps. Table scans only load used columns and projections
+    only calculate used expressions. Column references in all steps
+    are updated to refer to the remaining columns.
+    
+    Args:
+        plan: query plan in JSON (not changed)
+    
+    Returns:
+        query plan with pruned columns
+    """
+    plan = copy.deepcopy(plan)
+    steps = plan['rels']
+    if not all('outputType' in step for step in steps):
+        return plan
+    
+    widths = {step['id']:_arity(step) for step in steps}
+    used = {step['id']:set() for step in steps}
+    final_step = steps[-1]
+    used[final_step['id']] = set(range(widths[final_step['id']]))
+    for step in reversed(steps):
+        if not used[step['id']]:
+            used[step['id']] = {0}
+        input_cols = _used_inputs(step, used[step['id']], widths)
+        offset = 0
+        for in_id in step['inputs']:
+            used[in_id].update(
+                c - offset for c in input_cols
+                if offset <= c < offset + widths[in_id])
+            offset += widths[in_id]
+    
+    old_to_new = {}
+    for step in steps:
+        in_map = {}
+        old_offset = 0
+        new_offset = 0
+        for in_id in step['inputs']:
+            for old_idx, new_idx in old_to_new[in_id].items():
+                in_map[old_offset + old_idx] = new_offset + new_idx
+            old_offset += widths[in_id]
+            new_offset += len(old_to_new[in_id])
+        old_to_new[step['id']] = _prune_step(
+            step, used[step['id']], in_map)
+    
+    return plan
+
+
+def push_predicates(plan):
+    """ Annotates table scans with range predicates from filters.
+    
+    Considers filters whose input is a table scan. Conjuncts that
+    compare a numerical or date column to a numerical literal are
+    translated into inclusive ranges on stored column values. The
+    scan may use those ranges to skip data that cannot satisfy the
+    predicates. Filters are not removed since scans may still
+    return rows that do not satisfy all predicates.
+    
+    Args:
+        plan: query plan in JSON (not changed)
+    
+    Returns:
+        query plan with range predicates attached to table scans
+    """
+    plan = copy.deepcopy(plan)
+    steps = plan['rels']
+    id_to_step = {step['id']:step for step in steps}
+    for step in steps:
+        if step['relOp'] == 'LogicalFilter' and len(step['inputs']) == 1:
+            in_step = id_to_step[step['inputs'][0]]
+            if in_step['relOp'] == 'LogicalTableScan':
+                ranges = []
+                for conjunct in dbz.util.get_conjuncts(step['condition']):
+                    col_range = _column_range(conjunct)
+                    if col_range is not None:
+                        ranges += [col_range]
+                if ranges:
+                    table_cols = in_step.get('columns', None)
+                    if table_cols is not None:
+                        ranges = [[table_cols[c], l, u] for c, l, u in ranges]
+                    in_step['ranges'] = ranges
+    return plan
+
+
+def _arity(step):
+    """ Returns number of output columns of plan step. """
+    return len(step['outputType']['fields'])
+
+
+def _column_range(comparison):
+    """ Translates comparison between column and literal into range.
+    
+    Args:
+        comparison: an expression in JSON representation
+    
+    Returns:
+        list with column index, lower, and upper bound or None
+    """
+    flipped = {
+        'LESS_THAN':'GREATER_THAN', 'LESS_THAN_OR_EQUAL':'GREATER_THAN_OR_EQUAL',
+        'GREATER_THAN':'LESS_THAN', 'GREATER_THAN_OR_EQUAL':'LESS_THAN_OR_EQUAL',
+        'EQUALS':'EQUALS'}
+    if 'op' not in comparison or comparison['op']['kind'] not in flipped:
+        return None
+    op_kind = comparison['op']['kind']
+    column, literal = comparison['operands']
+    if 'literal' in column and 'input' in literal:
+        column, literal = literal, column
+        op_kind = flipped[op_kind]
+    if 'input' not in column or 'literal' not in literal:
+        return None
+    
+    numeric_types = ['DECIMAL', 'NUMERIC', 'INTEGER', 'DATE']
+    value = literal['literal']
+    if column['type']['type'] not in numeric_types or \
+        literal['type']['type'] not in numeric_types or \
+        isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    
+    # Literals and columns are scaled as in generated code
+    col_scale = column['type'].get('scale', None) or 0
+    lit_scale = literal['type'].get('scale', None)
+    if lit_scale is None:
+        lit_scale = 0
+    else:
+        value = round(value*float(f'1e{lit_scale}'))
+    bound = fractions.Fraction(value) * \
+        fractions.Fraction(10) ** (col_scale - lit_scale)
+    lower = math.floor(bound)
+    upper = math.ceil(bound)
+    
+    col_idx = column['input']
+    if op_kind == 'EQUALS':
+        return [col_idx, lower, upper]
+    elif op_kind in ['LESS_THAN', 'LESS_THAN_OR_EQUAL']:
+        return [col_idx, None, upper]
+    else:
+        return [col_idx, lower, None]
+
+
+def _prune_step(step, used_cols, in_map):
+    """ Removes unused output columns and updates column references.
+    
+    Args:
+        step: plan step to change in place
+        used_cols: indexes of output columns used by later steps
+        in_map: maps old to new indexes of input columns
+    
+    Returns:
+        dictionary mapping old to new output column indexes
+    """
+    rel_op = step['relOp']
+    fields = step['outputType']['fields']
+    if rel_op == 'LogicalTableScan':
+        kept = sorted(used_cols)
+        step['columns'] = kept
+    elif rel_op == 'LogicalProject':
+        kept = sorted(used_cols)
+        step['exprs'] = [_remap(step['exprs'][i], in_map) for i in kept]
+    elif rel_op in ['LogicalFilter', 'LogicalJoin', 'LogicalSort']:
+        kept = sorted(in_map)
+        if rel_op in ['LogicalFilter', 'LogicalJoin']:
+            step['condition'] = _remap(step['condition'], in_map)
+        if rel_op == 'LogicalJoin' and \
+            step['joinType'] in ['semi', 'anti'] and \
+            not step.get('nullPadding', False):
+            kept = [c for c in kept if c < len(fields)]
+        if rel_op == 'LogicalSort':
+            for field in step.get('collation', []):
+                field['field'] = in_map[int(field['field'])]
+    elif rel_op == 'LogicalAggregate':
+        kept = list(range(len(fields)))
+        step['group'] = [in_map[g] for g in step['group']]
+        for agg in step['aggs']:
+            agg['operands'] = [in_map[o] for o in agg['operands']]
+    else:
+        kept = list(range(len(fields)))
+    
+    step['outputType']['fields'] = [fields[i] for i in kept]
+    return {old_idx:new_idx for new_idx, old_idx in enumerate(kept)}
+
+
+def _remap(expression, in_map):
+    """ Updates column references in expression.
+    
+    Args:
+        expression: an expression in JSON representation
+        in_map: maps old to new column indexes
+    
+    Returns:
+        expression referencing new column indexes
+    """
+    if isinstance(expression, dict):
+        remapped = {k:_remap(v, in_map) for k, v in expression.items()}
+        if 'input' in expression:
+            new_idx = in_map[expression['input']]
+            remapped['input'] = new_idx
+            remapped['name'] = f'${new_idx}'
+        return remapped
+    elif isinstance(expression, list):
+        return [_remap(e, in_map) for e in expression]
+    else:
+        return expression
+
+
+def _used_inputs(step, used_cols, widths):
+    """ Determines input columns required to produce used output columns.
+    
+    Args:
+        step: a plan step
+        used_cols: indexes of output columns used by later steps
+        widths: maps step IDs to number of output columns
+    
+    Returns:
+        indexes of required columns (concatenating all inputs)
+    """
+    rel_op = step['relOp']
+    in_widths = [widths[i] for i in step['inputs']]
+    if rel_op in ['LogicalTableScan', 'LogicalValues']:
+        return set()
+    elif rel_op == 'LogicalProject':
+        exprs = [step['exprs'][i] for i in used_cols]
+        return dbz.util.get_column_refs(exprs)
+    elif rel_op == 'LogicalFilter':
+        return used_cols | dbz.util.get_column_refs(step['condition'])
+    elif rel_op == 'LogicalSort':
+        sort_cols = {int(f['field']) for f in step.get('collation', [])}
+        return used_cols | sort_cols
+    elif rel_op == 'LogicalAggregate':
+        agg_cols = {o for agg in step['aggs'] for o in agg['operands']}
+        return set(step['group']) | agg_cols
+    elif rel_op == 'LogicalJoin':
+        return used_cols | dbz.util.get_column_refs(step['condition'])
+    else:
+        return set(range(sum(in_widths)))
@@ -5,6 +5,7 @@ Created on Mar 6, 2022
 '''
 import argparse
 import dbz.engine
+import dbz.plan
 import dbz.util
 import os
 import prompt_toolkit
@@ -15,22 +16,43 @@ if __name__ == '__main__':
     parser.add_argument('data_dir', type=str, help='Path to data directory')
     parser.add_argument('lib_path', type=str, help='Path to library')
     parser.add_argument('python', type=str, help='Command for Python invocation')
+    parser.add_argument(
+        '--in_process', action='store_true', 
+        help='Execute queries without spawning Python processes')
+    parser.add_argument(
+        '--table_cache_mb', type=int, default=1024, 
+        help='Memory budget (in MB) for caching tables in process')
+    parser.add_argument(
+        '--planner_service', action='store_true', 
+        help='Plan queries in one long-running JVM')
     args = parser.parse_args()
 
     paths = dbz.util.DbzPaths(args.data_dir)
     with open(args.lib_path) as file:
         library = file.read()
-    engine = dbz.engine.DbzEngine(paths, library, args.python)
+    engine = dbz.engine.DbzEngine(
+        paths, library, args.python, args.in_process, 
+        table_cache_mb=args.table_cache_mb)
     
-    terminated = False
-    while not terminated:
-        user_input = prompt_toolkit.prompt('0>')
-        print(f'Input: {user_input}')
-        if user_input == 'quit':
-            terminated = True
-        else:
-            try:
-                engine.execute(user_input, 'query_result.csv')
-                os.system('cat query_result.csv')
-            except Exception as e:
-                print(f'Exception: {e}')
\ No newline at end of file
+    service = None
+    if args.planner_service:
+        service = dbz.plan.PlannerService(
+            paths.planner, paths.planner_service, paths.planner_socket)
+        service.start()
+    
+    try:
+        terminated = False
+        while not terminated:
+            user_input = prompt_toolkit.prompt('0>')
+            print(f'Input: {user_input}')
+            if user_input == 'quit':
+                terminated = True
+            else:
+                try:
+                    engine.execute(user_input, 'query_result.csv')
+                    os.system('cat query_result.csv')
+                except Exception as e:
+                    print(f'Exception: {e}')
+    finally:
+        if service is not None:
+            service.stop()
@@ -4,7 +4,9 @@ Created on Mar 6, 2022
 @author: immanueltrummer
 '''
 import dbz.check
+import dbz.code
 import dbz.engine
+import dbz.plan
 import dbz.util
 import json
 import openai
@@ -28,6 +30,11 @@ class Synthesizer():
         self.operator_nl = operator_nl
         self.solutions = {}
         self.solved_tasks = []
+        data_dir = self.config['test_access']['data_dir']
+        paths = dbz.util.DbzPaths(data_dir)
+        self.plan_cache = dbz.plan.PlanCache(
+            paths.schema, cache_dir=paths.plan_cache)
+        self.code_cache = dbz.code.CodeCache()
     
     def synthesize(self):
         """ Synthesize code for DBMS engine. 
@@ -137,11 +144,16 @@ class Synthesizer():
         test_access = self.config['test_access']
         data_dir = test_access['data_dir']
         python = test_access['python']
+        in_process = test_access.get('in_process', False)
+        table_cache_mb = test_access.get('table_cache_mb', 1024)
         paths = dbz.util.DbzPaths(data_dir)
         self.python_path = python
         queries = task['queries']
         
-        test_engine = dbz.engine.DbzEngine(paths, self._library(), python)
+        test_engine = dbz.engine.DbzEngine(
+            paths, self._library(), python, 
+            in_process, self.plan_cache, self.code_cache, 
+            table_cache_mb)
         validator = dbz.check.Validator(paths, queries, ref_engine)
         return validator.validate(test_engine)
     
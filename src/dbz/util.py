@@ -3,6 +3,9 @@ Created on Mar 9, 2022
 
 @author: immanueltrummer
 '''
+import collections
+
+
 class DbzPaths():
     """ Stores relevant paths in DB-Zero data directory. """
     
@@ -16,9 +19,77 @@ class DbzPaths():
         self.schema = f'{data_dir}/schema.sql'
         self.tmp_dir = f'{data_dir}/tmp'
         self.planner = 'jars/Planner.jar'
+        self.planner_socket = f'{self.tmp_dir}/planner.sock'
+        self.planner_service = 'src/dbz/java/PlannerService.java'
+        self.plan_cache = f'{self.tmp_dir}/plans'
         self.includes = 'src/dbz/include'
         self.code = f'{self.tmp_dir}/run_query.py'
+
+
+class LruCache():
+    """ Keeps a bounded number of entries, evicting least recently used. """
+    
+    def __init__(self, capacity):
+        """ Initializes empty cache.
         
+        Args:
+            capacity: maximal number of cache entries
+        """
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+    
+    def clear(self):
+        """ Removes all cache entries. """
+        self.entries.clear()
+    
+    def get(self, key):
+        """ Retrieves entry and marks it as recently used.
+        
+        Args:
+            key: retrieve entry for this key
+        
+        Returns:
+            cached value or None if not cached
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        else:
+            return None
+    
+    def put(self, key, value):
+        """ Inserts entry and evicts entries if capacity is exceeded.
+        
+        Args:
+            key: key of new entry
+            value: value of new entry
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+def get_column_refs(expression):
+    """ Collects columns referenced in expression.
+    
+    Args:
+        expression: an expression in JSON representation
+    
+    Returns:
+        set of referenced column indexes
+    """
+    refs = set()
+    if isinstance(expression, dict):
+        if 'input' in expression:
+            refs.add(expression['input'])
+        for value in expression.values():
+            refs.update(get_column_refs(value))
+    elif isinstance(expression, list):
+        for element in expression:
+            refs.update(get_column_refs(element))
+    return refs
+
 
 def get_conjuncts(expression):
     """ Decomposes AND expressions in query plans into components.
@@ -0,0 +1,29 @@
+'''
+Fixtures executing query plans with each operator library and each
+storage format.
+'''
+import os
+import pytest
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src'))
+
+import plan_runner
+
+LIBRARIES = {'list':'library.py', 'numpy':'library_numpy.py'}
+STORAGE_FORMATS = ['csv', 'binary']
+
+
+@pytest.fixture(
+    params=[(l, s) for l in LIBRARIES for s in STORAGE_FORMATS],
+    ids=lambda p:'-'.join(p))
+def runner(request, tmp_path, monkeypatch):
+    """ Returns runner executing plans on tables in temporary directory. """
+    library_name, storage = request.param
+    # Engine refers to included code via paths relative to repository
+    monkeypatch.chdir(plan_runner.REPO_DIR)
+    library_path = f'{plan_runner.REPO_DIR}/{LIBRARIES[library_name]}'
+    with open(library_path) as file:
+        library = file.read()
+    return plan_runner.PlanRunner(str(tmp_path), library, storage)
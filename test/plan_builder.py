@@ -0,0 +1,150 @@
+'''
+Helpers building query plans in the JSON format produced by the planner.
+'''
+BOOLEAN = {'type':'BOOLEAN', 'nullable':False}
+BIGINT = {'type':'BIGINT', 'nullable':False}
+DATE = {'type':'DATE', 'nullable':False}
+INTEGER = {'type':'INTEGER', 'nullable':False}
+
+
+def char(precision):
+    """ Returns type of fixed-length string columns. """
+    return {'type':'CHAR', 'nullable':False, 'precision':precision}
+
+
+def varchar(precision):
+    """ Returns type of variable-length string columns. """
+    return {'type':'VARCHAR', 'nullable':False, 'precision':precision}
+
+
+def decimal(precision, scale):
+    """ Returns type of decimal columns. """
+    return {
+        'type':'DECIMAL', 'nullable':False,
+        'precision':precision, 'scale':scale}
+
+
+def nullable(col_type):
+    """ Returns nullable version of given type. """
+    return {**col_type, 'nullable':True}
+
+
+def fields(columns):
+    """ Returns output type for columns.
+    
+    Args:
+        columns: list of (column name, column type) tuples
+    
+    Returns:
+        output type of plan step
+    """
+    return {'fields':[{**t, 'name':n} for n, t in columns]}
+
+
+def ref(index, col_type):
+    """ Returns reference to input column with given index. """
+    return {'input':index, 'name':f'${index}', 'type':col_type}
+
+
+def lit(value, col_type):
+    """ Returns literal with given value and type. """
+    return {'literal':value, 'type':col_type}
+
+
+def call(kind, operands, col_type=BOOLEAN, name=None, syntax='BINARY'):
+    """ Returns expression applying operator to operands.
+    
+    Args:
+        kind: kind of operator (e.g., EQUALS)
+        operands: list of operand expressions
+        col_type: type of expression result
+        name: name of operator (kind if None)
+        syntax: syntax of operator (e.g., BINARY or SPECIAL)
+    
+    Returns:
+        expression in JSON representation
+    """
+    op = {'name':name or kind, 'kind':kind, 'syntax':syntax}
+    return {'op':op, 'operands':operands, 'type':col_type}
+
+
+def like(operand, pattern, escape=None):
+    """ Returns LIKE predicate with literal pattern (and escape). """
+    operands = [operand, lit(pattern, char(len(pattern)))]
+    if escape is not None:
+        operands += [lit(escape, char(1))]
+    return call('LIKE', operands, syntax='SPECIAL')
+
+
+def agg(kind, operands, col_type=BIGINT, distinct=False):
+    """ Returns aggregate of given kind on operand columns. """
+    return {
+        'agg':{'kind':kind, 'name':kind}, 'operands':operands,
+        'distinct':distinct, 'type':col_type}
+
+
+def scan(step_id, table, columns):
+    """ Returns step scanning table with given columns. """
+    return {
+        'id':str(step_id), 'relOp':'LogicalTableScan',
+        'table':[table], 'inputs':[], 'outputType':fields(columns)}
+
+
+def select(step_id, input_id, columns, condition):
+    """ Returns step filtering input rows by condition. """
+    return {
+        'id':str(step_id), 'relOp':'LogicalFilter',
+        'inputs':[str(input_id)], 'outputType':fields(columns),
+        'condition':condition}
+
+
+def project(step_id, input_id, columns, exprs):
+    """ Returns step evaluating one expression per output column. """
+    return {
+        'id':str(step_id), 'relOp':'LogicalProject',
+        'inputs':[str(input_id)], 'outputType':fields(columns),
+        'exprs':exprs}
+
+
+def join(step_id, input_ids, join_type, columns, condition):
+    """ Returns step joining two inputs. """
+    return {
+        'id':str(step_id), 'relOp':'LogicalJoin',
+        'inputs':[str(i) for i in input_ids], 'joinType':join_type,
+        'outputType':fields(columns), 'condition':condition}
+
+
+def aggregate(step_id, input_id, columns, group, aggs):
+    """ Returns step aggregating input rows per group. """
+    return {
+        'id':str(step_id), 'relOp':'LogicalAggregate',
+        'inputs':[str(input_id)], 'outputType':fields(columns),
+        'group':group, 'aggs':aggs}
+
+
+def sort(step_id, input_id, columns, collation, fetch=None):
+    """ Returns step sorting input rows (and keeping fetch rows).
+    
+    Args:
+        step_id: ID of plan step
+        input_id: ID of input step
+        columns: list of (column name, column type) tuples
+        collation: list of (column index, direction, nulls) tuples
+        fetch: number of rows to keep (all rows if None)
+    
+    Returns:
+        plan step in JSON representation
+    """
+    step = {
+        'id':str(step_id), 'relOp':'LogicalSort',
+        'inputs':[str(input_id)], 'outputType':fields(columns),
+        'collation':[
+            {'field':f, 'direction':d, 'nulls':n} for f, d, n in collation]}
+    if fetch is not None:
+        step['fetch'] = lit(fetch, INTEGER)
+    return step
+
+
+def plan(*steps):
+    """ Returns plan consisting of given steps. """
+    return {'rels':list(steps)}
@@ -0,0 +1,100 @@
+'''
+Executes query plans on small tables written by tests.
+'''
+import copy
+import csv
+import dbz.engine
+import dbz.include.storage
+import dbz.util
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PlanRunner():
+    """ Executes query plans in process, bypassing the planner. """
+    
+    def __init__(self, data_dir, library, storage, code_cache=None):
+        """ Initializes engine for given data directory.
+        
+        Args:
+            data_dir: directory storing tables
+            library: code of operator library
+            storage: storage format of tables (csv or binary)
+            code_cache: share this code cache (use private cache if None)
+        """
+        self.data_dir = data_dir
+        self.storage = storage
+        os.makedirs(f'{data_dir}/tmp', exist_ok=True)
+        self.paths = dbz.util.DbzPaths(data_dir)
+        self.engine = dbz.engine.DbzEngine(
+            self.paths, library, sys.executable, 
+            in_process=True, code_cache=code_cache)
+        self.nr_queries = 0
+    
+    def write_table(
+            self, name, rows, block_size=dbz.include.storage.BLOCK_SIZE):
+        """ Writes table in storage format of runner.
+        
+        Args:
+            name: name of table (lower case)
+            rows: list of rows (None representing NULL)
+            block_size: rows per block in zone maps (binary format)
+        """
+        path = f'{self.data_dir}/{name}'
+        if self.storage == 'binary':
+            columns = [list(c) for c in zip(*rows)]
+            dbz.include.storage.write_binary(columns, path, block_size)
+        else:
+            with open(f'{path}.csv', 'w', newline='') as file:
+                csv.writer(file).writerows(rows)
+    
+    def run(self, plan):
+        """ Executes plan and returns result rows.
+        
+        Args:
+            plan: query plan in JSON representation
+        
+        Returns:
+            list of result rows (trailing spaces are removed from strings)
+        """
+        self.nr_queries += 1
+        self.engine.planner.plan = lambda _: copy.deepcopy(plan)
+        out = f'{self.paths.tmp_dir}/result_{self.nr_queries}.csv'
+        assert self.engine.execute(f'query {self.nr_queries}', out)
+        with open(out) as file:
+            return [[parse(v) for v in row] for row in csv.reader(file)]
+
+
+def parse(value):
+    """ Parses value from result file.
+    
+    Args:
+        value: string read from result file
+    
+    Returns:
+        None (NULL), number (rounded), or string without trailing spaces
+    """
+    if value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return value.rstrip()
+    if number.is_integer():
+        return int(number)
+    else:
+        return round(number, 6)
+
+
+def unordered(rows):
+    """ Sorts rows to compare results in any order (NULL last).
+    
+    Args:
+        rows: list of rows
+    
+    Returns:
+        sorted list of rows
+    """
+    return sorted(rows, key=lambda r:[(v is None, v or 0) for v in r])
@@ -0,0 +1,70 @@
+'''
+Tests aggregation with and without grouping.
+'''
+from plan_builder import *
+from plan_runner import unordered
+
+QUANTITY = decimal(15, 2)
+LINEITEM = [
+    ('L_ORDERKEY', INTEGER), ('L_QUANTITY', QUANTITY),
+    ('L_SHIPMODE', varchar(4))]
+# Decimal values are stored as integers, scaled by 10^scale
+ROWS = [
+    [1, 500, 'AIR'], [1, 300, 'MAIL'], [2, 100, 'AIR'],
+    [3, 700, 'AIR'], [3, 200, 'MAIL'], [2, 400, 'AIR']]
+AGGS = [
+    agg('SUM', [1], QUANTITY), agg('MIN', [1], QUANTITY),
+    agg('MAX', [1], QUANTITY), agg('AVG', [1], QUANTITY),
+    agg('COUNT', []), agg('COUNT', [0], distinct=True)]
+AGG_COLUMNS = [
+    ('S', QUANTITY), ('MN', QUANTITY), ('MX', QUANTITY),
+    ('A', QUANTITY), ('C', BIGINT), ('D', BIGINT)]
+
+
+def test_grouped_aggregates(runner):
+    """ Aggregates are calculated for each group. """
+    runner.write_table('lineitem', ROWS)
+    result = runner.run(plan(
+        scan(0, 'LINEITEM', LINEITEM),
+        aggregate(1, 0, [LINEITEM[2]] + AGG_COLUMNS, [2], AGGS)))
+    assert unordered(result) == [
+        ['AIR', 17, 1, 7, 4.25, 4, 3], ['MAIL', 5, 2, 3, 2.5, 2, 2]]
+
+
+def test_grouped_count_after_filter(runner):
+    """ Groups without rows satisfying the filter are omitted. """
+    runner.write_table('lineitem', ROWS)
+    condition = call('GREATER_THAN', [ref(1, QUANTITY), lit(4, INTEGER)])
+    result = runner.run(plan(
+        scan(0, 'LINEITEM', LINEITEM),
+        select(1, 0, LINEITEM, condition),
+        aggregate(
+            2, 1, [LINEITEM[2], ('C', BIGINT)], [2], [agg('COUNT', [])])))
+    assert result == [['AIR', 2]]
+
+
+def test_aggregates_without_groups(runner):
+    """ Aggregates without grouping produce a single row. """
+    runner.write_table('lineitem', ROWS)
+    result = runner.run(plan(
+        scan(0, 'LINEITEM', LINEITEM),
+        aggregate(1, 0, AGG_COLUMNS, [], AGGS)))
+    assert result == [[22, 1, 7, round(22 / 6, 6), 6, 3]]
+
+
+def test_group_by_nullable_columns(runner):
+    """ NULL keys form groups, aggregates ignore NULL values. """
+    runner.write_table('lineitem', [
+        [1, 500, 'AIR'], [1, None, 'AIR'], [None, 300, 'AIR'],
+        [None, 100, None], [None, None, None], [2, None, 'MAIL']])
+    columns = [
+        (n, nullable(t)) for n, t in LINEITEM[:1] + LINEITEM[2:]]
+    aggs = [agg('SUM', [1], nullable(QUANTITY)), agg('COUNT', [1])]
+    result = runner.run(plan(
+        scan(0, 'LINEITEM', [(n, nullable(t)) for n, t in LINEITEM]),
+        aggregate(
+            1, 0, columns + [('S', nullable(QUANTITY)), ('C', BIGINT)],
+            [0, 2], aggs)))
+    assert unordered(result) == [
+        [1, 'AIR', 5, 1], [2, 'MAIL', None, 0],
+        [None, 'AIR', 3, 1], [None, None, 1, 1]]
@@ -0,0 +1,37 @@
+'''
+Tests reuse of generated code across queries.
+'''
+from plan_builder import *
+import os
+import plan_runner
+import shutil
+
+PART = [('P_PARTKEY', INTEGER), ('P_NAME', varchar(8))]
+SCAN_PLAN = plan(scan(0, 'PART', PART))
+
+
+def test_code_depends_on_storage_format(runner):
+    """ Code is regenerated after converting tables to another format. """
+    runner.write_table('part', [[1, 'bolt']])
+    assert runner.run(SCAN_PLAN) == [[1, 'bolt']]
+    
+    table_path = f'{runner.data_dir}/part'
+    if runner.storage == 'binary':
+        shutil.rmtree(table_path)
+        runner.storage = 'csv'
+    else:
+        os.remove(f'{table_path}.csv')
+        runner.storage = 'binary'
+    runner.write_table('part', [[2, 'nut']])
+    assert runner.run(SCAN_PLAN) == [[2, 'nut']]
+
+
+def test_code_depends_on_data_directory(runner, tmp_path):
+    """ Engines sharing a code cache read from their own directory. """
+    other = plan_runner.PlanRunner(
+        f'{tmp_path}/other', runner.engine.library,
+        runner.storage, runner.engine.code_cache)
+    runner.write_table('part', [[1, 'bolt']])
+    other.write_table('part', [[2, 'nut']])
+    assert runner.run(SCAN_PLAN) == [[1, 'bolt']]
+    assert other.run(SCAN_PLAN) == [[2, 'nut']]
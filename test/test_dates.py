@@ -0,0 +1,69 @@
+'''
+Tests processing of dates, stored as days since 1/1/1970.
+'''
+from plan_builder import *
+from plan_runner import unordered
+import datetime
+import dbz.include.dates as dates
+import numpy as np
+
+EPOCH = datetime.date(1970, 1, 1)
+ORDERS = [('O_ORDERKEY', INTEGER), ('O_ORDERDATE', nullable(DATE))]
+ORDER_DATES = [
+    datetime.date(1992, 1, 1), datetime.date(1996, 2, 29),
+    datetime.date(1998, 12, 31), datetime.date(1996, 3, 1), None]
+
+
+def days(date):
+    """ Returns days since 1/1/1970 for date (None for NULL). """
+    return None if date is None else (date - EPOCH).days
+
+
+def extract(field):
+    """ Returns expression extracting field from order date. """
+    return call(
+        'EXTRACT', [
+            lit(field.upper(), {'type':'SYMBOL', 'nullable':False}),
+            ref(1, nullable(DATE))],
+        nullable(BIGINT), syntax='FUNCTION')
+
+
+def test_days_to_civil():
+    """ Integer arithmetic matches the calendar, also for arrays. """
+    all_days = list(range(-700000, 2900000, 97)) + [-1, 0, 11016, 11017]
+    for d in all_days:
+        date = EPOCH + datetime.timedelta(days=d)
+        assert dates.days_to_civil(d) == (date.year, date.month, date.day)
+        assert dates.format_date(d) == date.isoformat()
+    fields = dates.days_to_civil(np.array(all_days))
+    assert list(zip(*[f.tolist() for f in fields])) == \
+        [dates.days_to_civil(d) for d in all_days]
+
+
+def test_extract_and_format(runner):
+    """ Date fields are extracted and dates formatted, except NULL. """
+    runner.write_table(
+        'orders', [[k, days(d)] for k, d in enumerate(ORDER_DATES)])
+    output = ORDERS + [
+        (f, nullable(BIGINT)) for f in ['Y', 'M', 'D']]
+    result = runner.run(plan(
+        scan(0, 'ORDERS', ORDERS),
+        project(1, 0, output, [
+            ref(0, INTEGER), ref(1, nullable(DATE)),
+            extract('year'), extract('month'), extract('day')])))
+    assert unordered(result) == [
+        [k, d.isoformat(), d.year, d.month, d.day] if d else
+        [k, None, None, None, None] for k, d in enumerate(ORDER_DATES)]
+
+
+def test_group_by_year(runner):
+    """ Rows are grouped by extracted years. """
+    runner.write_table(
+        'orders', [[k, days(d)] for k, d in enumerate(ORDER_DATES)])
+    result = runner.run(plan(
+        scan(0, 'ORDERS', ORDERS),
+        project(1, 0, [('Y', nullable(BIGINT))], [extract('year')]),
+        aggregate(
+            2, 1, [('Y', nullable(BIGINT)), ('C', BIGINT)],
+            [0], [agg('COUNT', [])])))
+    assert unordered(result) == [[1992, 1], [1996, 2], [1998, 1], [None, 1]]
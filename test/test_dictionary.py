@@ -0,0 +1,51 @@
+'''
+Tests processing of dictionary-encoded string columns.
+'''
+from plan_builder import *
+from plan_runner import unordered
+import dbz.include.storage as storage
+
+ORDERS = [('O_ORDERKEY', INTEGER)]
+LINEITEM = [
+    ('L_ORDERKEY', INTEGER), ('L_QUANTITY', INTEGER),
+    ('L_COMMENT', varchar(44))]
+
+
+def write_tables(runner):
+    """ Writes tables with comments repeating often enough for encoding. """
+    runner.write_table('orders', [[k] for k in range(1, 7)])
+    runner.write_table('lineitem', [
+        [1, 5, 'fast'], [1, 7, 'fast'], [2, 3, None], [2, 4, 'slow'],
+        [3, 50, 'slow'], [3, 6, 'fast'], [4, 60, 'fast'], [1, 2, 'slow'],
+        [2, 8, 'fast'], [3, 1, 'slow']])
+
+
+def test_group_by_null_padded_column(runner):
+    """ NULL values from outer joins and from the table form one group. """
+    write_tables(runner)
+    joined = ORDERS + [(n, nullable(t)) for n, t in LINEITEM]
+    output = [('L_COMMENT', nullable(varchar(44))), ('N', BIGINT)]
+    result = runner.run(plan(
+        scan(0, 'ORDERS', ORDERS),
+        scan(1, 'LINEITEM', LINEITEM),
+        select(2, 1, LINEITEM, call(
+            'LESS_THAN', [ref(1, INTEGER), lit(10, INTEGER)])),
+        join(3, [0, 2], 'left', joined, call(
+            'EQUALS', [ref(0, INTEGER), ref(1, INTEGER)])),
+        aggregate(4, 3, output, [3], [agg('COUNT', [])])))
+    assert unordered(result) == [['fast', 4], ['slow', 3], [None, 4]]
+
+
+def test_encode_few_distinct_strings():
+    """ Columns with few distinct strings are encoded, NaN as NULL. """
+    column = ['b', 'a', None, float('nan'), 'b', 'a'] * 10
+    encoded = storage.dictionary_encode(column)
+    assert encoded.dictionary == ['a', 'b', None]
+    assert list(encoded) == [None if v != v else v for v in column]
+
+
+def test_skip_encoding_many_distinct_strings():
+    """ Encoding stops early for columns with many distinct values. """
+    nr_rows = 4 * storage.BLOCK_SIZE
+    assert storage.dictionary_encode([str(i) for i in range(nr_rows)]) is None
+    assert storage.dictionary_encode(list(range(nr_rows))) is None
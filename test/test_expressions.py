@@ -0,0 +1,138 @@
+'''
+Tests evaluation of scalar expressions in projections and filters.
+'''
+from plan_builder import *
+from plan_runner import unordered
+import dbz.code
+
+PART = [
+    ('P_PARTKEY', INTEGER), ('P_SIZE', INTEGER),
+    ('P_PRICE', decimal(15, 2)), ('P_NAME', nullable(varchar(8)))]
+# Decimal values are stored as integers, scaled by 10^scale
+ROWS = [
+    [1, 3, 1050, 'bolt'], [2, 7, 200, None],
+    [3, 5, 999, 'nut'], [4, 9, 1, 'bolt']]
+BIG_SIZE = call('GREATER_THAN', [ref(1, INTEGER), lit(5, INTEGER)])
+IS_BOLT = call('EQUALS', [ref(3, nullable(varchar(8))), lit('bolt', char(4))])
+
+
+def project_part(output, exprs):
+    """ Returns plan evaluating expressions on part table. """
+    return plan(scan(0, 'PART', PART), project(1, 0, output, exprs))
+
+
+def test_arithmetic_with_decimals(runner):
+    """ Integer operands are rescaled before adding decimals. """
+    runner.write_table('part', ROWS)
+    result = runner.run(project_part(
+        [('K', INTEGER), ('S', INTEGER), ('P', decimal(15, 2))],
+        [ref(0, INTEGER),
+         call('PLUS', [
+             call('TIMES', [ref(1, INTEGER), lit(2, INTEGER)], INTEGER),
+             lit(1, INTEGER)], INTEGER, name='+'),
+         call('PLUS', [ref(2, decimal(15, 2)), ref(1, INTEGER)],
+              decimal(15, 2), name='+')]))
+    assert unordered(result) == [
+        [1, 7, 13.5], [2, 15, 9], [3, 11, 14.99], [4, 19, 9.01]]
+
+
+def test_three_valued_logic(runner):
+    """ OR of NULL and true is true, OR of NULL and false is NULL. """
+    runner.write_table('part', ROWS)
+    result = runner.run(project_part(
+        [('K', INTEGER), ('B', nullable(BOOLEAN)), ('N', BOOLEAN)],
+        [ref(0, INTEGER),
+         call('OR', [IS_BOLT, BIG_SIZE], nullable(BOOLEAN)),
+         call('IS_NULL', [ref(3, nullable(varchar(8)))],
+              name='IS NULL', syntax='POSTFIX')]))
+    assert unordered(result) == [
+        [1, 'True', 'False'], [2, 'True', 'True'],
+        [3, 'False', 'False'], [4, 'True', 'False']]
+
+
+def test_case(runner):
+    """ CASE selects value depending on condition. """
+    runner.write_table('part', ROWS)
+    result = runner.run(project_part(
+        [('K', INTEGER), ('C', char(5))],
+        [ref(0, INTEGER),
+         call('CASE', [BIG_SIZE, lit('big', char(3)), lit('small', char(5))],
+              char(5), syntax='SPECIAL')]))
+    assert unordered(result) == [
+        [1, 'small'], [2, 'big'], [3, 'small'], [4, 'big']]
+
+
+def test_filter_on_combined_conditions(runner):
+    """ Rows whose condition evaluates to NULL are filtered out. """
+    runner.write_table('part', ROWS)
+    condition = call('AND', [
+        call('NOT', [IS_BOLT], nullable(BOOLEAN), syntax='PREFIX'),
+        call('LESS_THAN', [ref(1, INTEGER), lit(8, INTEGER)])],
+        nullable(BOOLEAN))
+    result = runner.run(plan(
+        scan(0, 'PART', PART), select(1, 0, PART, condition)))
+    assert result == [[3, 5, 9.99, 'nut']]
+
+
+def test_constant_columns(runner):
+    """ Literals are expanded to the number of filtered rows. """
+    runner.write_table('part', ROWS)
+    output = [
+        ('K', INTEGER), ('I', INTEGER), ('C', char(1)),
+        ('D', decimal(2, 1)), ('N', nullable(INTEGER))]
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, BIG_SIZE),
+        project(2, 1, output, [
+            ref(0, INTEGER), lit(7, INTEGER), lit('x', char(1)),
+            lit(1.5, decimal(2, 1)), lit(None, nullable(INTEGER))])))
+    assert unordered(result) == [
+        [2, 7, 'x', 1.5, None], [4, 7, 'x', 1.5, None]]
+
+
+def test_compare_with_constants(runner):
+    """ Columns are compared with decimal constants in each row. """
+    runner.write_table('part', ROWS)
+    price = ref(2, decimal(15, 2))
+    condition = call('AND', [
+        call('GREATER_THAN_OR_EQUAL', [price, lit(2, decimal(3, 2))]),
+        call('LESS_THAN_OR_EQUAL', [price, lit(10.5, decimal(4, 2))])])
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, condition),
+        project(2, 1, [('K', INTEGER)], [ref(0, INTEGER)])))
+    assert unordered(result) == [[1], [2], [3]]
+
+
+PRICE_PLUS_SIZE = call(
+    'PLUS', [ref(2, decimal(15, 2)), ref(1, INTEGER)],
+    decimal(15, 2), name='+')
+SHARED_EXPRS = [
+    PRICE_PLUS_SIZE,
+    call('TIMES', [PRICE_PLUS_SIZE, lit(2, INTEGER)], decimal(15, 2)),
+    call('CASE', [BIG_SIZE, PRICE_PLUS_SIZE, lit(0, decimal(15, 2))],
+         decimal(15, 2), syntax='SPECIAL')]
+
+
+def test_shared_subexpressions_evaluated_once():
+    """ Repeated subtrees outside of CASE are evaluated only once. """
+    coder = dbz.code.Coder(None, False)
+    parts, exprs = coder._shared_code(SHARED_EXPRS)
+    assert len(parts) == 1 and parts[0].startswith('input_rel = ')
+    temp_ref = {'input':3, 'type':decimal(15, 2)}
+    assert exprs[0] == temp_ref
+    assert exprs[1]['operands'][0] == temp_ref
+    assert exprs[2] == SHARED_EXPRS[2]
+
+
+def test_shared_subexpressions(runner):
+    """ Projections with repeated subtrees return correct values. """
+    runner.write_table('part', ROWS)
+    keep = call('LESS_THAN', [ref(0, INTEGER), lit(4, INTEGER)])
+    output = [(c, decimal(15, 2)) for c in ['S', 'T', 'C']]
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, keep),
+        project(2, 1, output, SHARED_EXPRS)))
+    assert unordered(result) == [
+        [9, 18, 9], [13.5, 27, 0], [14.99, 29.98, 0]]
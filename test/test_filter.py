@@ -0,0 +1,102 @@
+'''
+Tests filters passing selection vectors to subsequent operators.
+'''
+from plan_builder import *
+from plan_runner import unordered
+import pytest
+
+PART = [('P_PARTKEY', INTEGER), ('P_SIZE', INTEGER), ('P_NAME', varchar(8))]
+ROWS = [[1, 3, 'bolt'], [2, 7, 'nut'], [3, 5, 'screw'], [4, 9, 'nail']]
+
+
+def size_above(size):
+    """ Returns condition comparing part size to constant. """
+    return call('GREATER_THAN', [ref(1, INTEGER), lit(size, INTEGER)])
+
+
+def test_chained_filters(runner):
+    """ Filters on filtered input only consider remaining rows. """
+    runner.write_table('part', ROWS)
+    below = call('LESS_THAN', [ref(0, INTEGER), lit(4, INTEGER)])
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, size_above(4)),
+        select(2, 1, PART, below),
+        project(3, 2, [PART[2]], [ref(2, varchar(8))])))
+    assert unordered(result) == [['nut'], ['screw']]
+
+
+def test_filters_before_join(runner):
+    """ Joins gather columns of filtered inputs. """
+    runner.write_table('part', ROWS)
+    condition = call('EQUALS', [ref(0, INTEGER), ref(3, INTEGER)])
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, size_above(4)),
+        scan(2, 'PART', PART),
+        select(3, 2, PART, size_above(6)),
+        join(4, [1, 3], 'inner', PART + PART, condition)))
+    assert unordered(result) == [r + r for r in ROWS if r[1] > 6]
+
+
+def test_filter_before_sort(runner):
+    """ Sorts consider only rows satisfying the filter. """
+    runner.write_table('part', ROWS)
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, size_above(4)),
+        sort(2, 1, PART, [(1, 'DESCENDING', 'LAST')], fetch=2)))
+    assert result == [[4, 9, 'nail'], [2, 7, 'nut']]
+
+
+@pytest.mark.parametrize('value', [True, False])
+def test_constant_condition(runner, value):
+    """ Constant conditions keep all or no rows. """
+    runner.write_table('part', ROWS)
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, lit(value, BOOLEAN))))
+    assert unordered(result) == (ROWS if value else [])
+
+
+def test_filter_with_two_consumers(runner):
+    """ Both inputs of a self-join see rows satisfying the filter. """
+    runner.write_table('part', ROWS)
+    condition = call('LESS_THAN', [ref(1, INTEGER), ref(4, INTEGER)])
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, size_above(4)),
+        join(2, [1, 1], 'inner', PART + PART, condition)))
+    big = [r for r in ROWS if r[1] > 4]
+    assert unordered(result) == unordered(
+        [r + s for r in big for s in big if r[1] < s[1]])
+
+
+def test_disjunction_of_conjunctions(runner):
+    """ Rows satisfying several disjuncts are returned once, in order. """
+    runner.write_table('part', ROWS)
+    small_key = call('LESS_THAN', [ref(0, INTEGER), lit(3, INTEGER)])
+    is_nail = call('EQUALS', [ref(2, varchar(8)), lit('nail', char(4))])
+    condition = call('OR', [
+        call('AND', [size_above(4), small_key]),
+        call('AND', [size_above(6), is_nail]),
+        size_above(2)])
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, size_above(4)),
+        select(2, 1, PART, condition)))
+    assert result == [r for r in ROWS if r[1] > 4]
+
+
+def test_disjunction_with_null(runner):
+    """ Disjunctions with NULL operands only keep rows with true ones. """
+    rows = [r[:2] + [None if r[0] % 2 else r[2]] for r in ROWS]
+    runner.write_table('part', rows)
+    columns = PART[:2] + [('P_NAME', nullable(varchar(8)))]
+    is_nut = call(
+        'EQUALS', [ref(2, nullable(varchar(8))), lit('nut', char(3))],
+        nullable(BOOLEAN))
+    condition = call('OR', [is_nut, size_above(8)], nullable(BOOLEAN))
+    result = runner.run(plan(
+        scan(0, 'PART', columns), select(1, 0, columns, condition)))
+    assert result == [[2, 7, 'nut'], [4, 9, 'nail']]
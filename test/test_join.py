@@ -0,0 +1,136 @@
+'''
+Tests joins via row index vectors.
+'''
+from plan_builder import *
+from plan_runner import unordered
+import dbz.rewrite
+import pytest
+
+ORDERS = [('O_ORDERKEY', INTEGER), ('O_PRIORITY', varchar(8))]
+LINEITEM = [('L_ORDERKEY', INTEGER), ('L_QUANTITY', INTEGER)]
+ORDER_ROWS = [[1, 'HIGH'], [2, 'LOW'], [3, 'HIGH'], [5, 'LOW']]
+LINEITEM_ROWS = [[1, 10], [1, 20], [2, 30], [4, 40], [3, 50], [1, 60]]
+
+
+def join_plan(join_type, columns, condition, left='ORDERS'):
+    """ Returns plan joining orders and lineitem.
+    
+    Args:
+        join_type: type of join (e.g., inner or left)
+        columns: output columns of join
+        condition: join condition
+        left: name of left input table
+    
+    Returns:
+        query plan joining tables
+    """
+    tables = {'ORDERS':ORDERS, 'LINEITEM':LINEITEM}
+    right = 'LINEITEM' if left == 'ORDERS' else 'ORDERS'
+    return plan(
+        scan(0, left, tables[left]),
+        scan(1, right, tables[right]),
+        join(2, [0, 1], join_type, columns, condition))
+
+
+def key_equality(nr_left_columns):
+    """ Returns predicate comparing first columns of join inputs. """
+    return call('EQUALS', [
+        ref(0, INTEGER), ref(nr_left_columns, INTEGER)])
+
+
+@pytest.mark.parametrize('left', ['ORDERS', 'LINEITEM'])
+def test_inner_join_keeps_column_order(runner, left):
+    """ Output columns keep input order, whichever input is smaller. """
+    runner.write_table('orders', ORDER_ROWS)
+    runner.write_table('lineitem', LINEITEM_ROWS)
+    if left == 'ORDERS':
+        columns = ORDERS + LINEITEM
+    else:
+        columns = LINEITEM + ORDERS
+    result = runner.run(join_plan(
+        'inner', columns, key_equality(2), left))
+    expected = [
+        [1, 'HIGH', 1, 10], [1, 'HIGH', 1, 20], [1, 'HIGH', 1, 60],
+        [2, 'LOW', 2, 30], [3, 'HIGH', 3, 50]]
+    if left == 'LINEITEM':
+        expected = [r[2:] + r[:2] for r in expected]
+    assert unordered(result) == unordered(expected)
+
+
+@pytest.mark.parametrize('join_type', ['left', 'right', 'full'])
+def test_outer_join_pads_with_null(runner, join_type):
+    """ Rows without partner are padded with NULL values. """
+    runner.write_table('orders', ORDER_ROWS)
+    runner.write_table('lineitem', LINEITEM_ROWS)
+    columns = [(n, nullable(t)) for n, t in ORDERS + LINEITEM]
+    big = call('GREATER_THAN', [ref(3, INTEGER), lit(35, INTEGER)])
+    condition = call('AND', [key_equality(2), big])
+    result = runner.run(join_plan(join_type, columns, condition))
+    expected = [[1, 'HIGH', 1, 60], [3, 'HIGH', 3, 50]]
+    if join_type in ['left', 'full']:
+        expected += [[2, 'LOW', None, None], [5, 'LOW', None, None]]
+    if join_type in ['right', 'full']:
+        expected += [[None, None] + r for r in LINEITEM_ROWS if r[1] < 35]
+        expected += [[None, None, 4, 40]]
+    assert unordered(result) == unordered(expected)
+
+
+def test_join_without_equality(runner):
+    """ Joins without equality predicates check all pairs of rows. """
+    runner.write_table('orders', ORDER_ROWS)
+    runner.write_table('lineitem', LINEITEM_ROWS)
+    condition = call('GREATER_THAN', [ref(0, INTEGER), ref(2, INTEGER)])
+    result = runner.run(join_plan('inner', ORDERS + LINEITEM, condition))
+    expected = [
+        o + l for o in ORDER_ROWS for l in LINEITEM_ROWS if o[0] > l[0]]
+    assert unordered(result) == unordered(expected)
+
+
+@pytest.mark.parametrize('join_type', ['semi', 'anti'])
+@pytest.mark.parametrize('filtered', [False, True])
+def test_semi_and_anti_join(runner, join_type, filtered):
+    """ Semi and anti joins return left rows with or without partner. """
+    runner.write_table('orders', ORDER_ROWS)
+    runner.write_table('lineitem', LINEITEM_ROWS)
+    condition = key_equality(2)
+    if filtered:
+        big = call('GREATER_THAN', [ref(3, INTEGER), lit(35, INTEGER)])
+        condition = call('AND', [condition, big])
+    result = runner.run(join_plan(join_type, ORDERS, condition))
+    partner_keys = [1, 3] if filtered else [1, 2, 3]
+    anti = join_type == 'anti'
+    expected = [r for r in ORDER_ROWS if (r[0] in partner_keys) != anti]
+    assert unordered(result) == expected
+
+
+def null_partner_plan(null_column):
+    """ Returns plan filtering left join result on NULL column.
+    
+    Args:
+        null_column: index of join output column that must be NULL
+    
+    Returns:
+        plan with left outer join followed by IS NULL filter
+    """
+    columns = [(n, nullable(t)) for n, t in ORDERS + LINEITEM]
+    steps = join_plan('left', columns, key_equality(2))['rels']
+    is_null = call(
+        'IS_NULL', [ref(null_column, nullable(INTEGER))],
+        name='IS NULL', syntax='POSTFIX')
+    return plan(*steps, select(3, 2, columns, is_null))
+
+
+def test_detect_anti_joins():
+    """ Only filters on NULL join keys turn left joins into anti joins. """
+    join_step = dbz.rewrite.detect_anti_joins(null_partner_plan(2))['rels'][2]
+    assert join_step['joinType'] == 'anti' and join_step['nullPadding']
+    join_step = dbz.rewrite.detect_anti_joins(null_partner_plan(3))['rels'][2]
+    assert join_step['joinType'] == 'left'
+
+
+def test_left_join_without_partner(runner):
+    """ Left join rows without partner are found via anti join. """
+    runner.write_table('orders', ORDER_ROWS)
+    runner.write_table('lineitem', LINEITEM_ROWS)
+    result = runner.run(null_partner_plan(2))
+    assert result == [[5, 'LOW', None, None]]
@@ -0,0 +1,58 @@
+'''
+Tests evaluation of LIKE predicates.
+'''
+from plan_builder import *
+import dbz.code
+import pytest
+
+PART = [('P_PARTKEY', INTEGER), ('P_NAME', nullable(varchar(16)))]
+NAMES = [
+    'PROMO BRASS', 'STANDARD BRASS', 'green tin', '%odd',
+    'a.b_c', 'axbyc', None, 'PROMO green']
+
+
+@pytest.mark.parametrize('pattern, escape, kind', [
+    ('PROMO%', None, 'prefix'), ('%BRASS', None, 'suffix'),
+    ('%green%', None, 'contains'), ('green tin', None, 'equals'),
+    ('a.b_c', None, 'regex'), ('\\%%', '\\', 'prefix'),
+    ('a.b!_%', '!', 'prefix')])
+def test_pattern_kinds(pattern, escape, kind):
+    """ Patterns with wildcards only at their ends use string tests. """
+    coder = dbz.code.Coder(None, False)
+    assert coder._like_pattern(pattern, escape)[0] == kind
+
+
+@pytest.mark.parametrize('pattern, escape, expected', [
+    ('PROMO%', None, ['PROMO BRASS', 'PROMO green']),
+    ('%BRASS', None, ['PROMO BRASS', 'STANDARD BRASS']),
+    ('%green%', None, ['green tin', 'PROMO green']),
+    ('green tin', None, ['green tin']),
+    ('a.b_c', None, ['a.b_c']),
+    ('%b%c', None, ['a.b_c', 'axbyc']),
+    ('\\%%', '\\', ['%odd']),
+    ('a.b!_%', '!', ['a.b_c'])])
+def test_like(runner, pattern, escape, expected):
+    """ Wildcards match characters, other characters match themselves. """
+    runner.write_table('part', list(enumerate(NAMES)))
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, like(
+            ref(1, nullable(varchar(16))), pattern, escape)),
+        project(2, 1, [PART[1]], [ref(1, nullable(varchar(16)))])))
+    assert result == [[n] for n in expected]
+
+
+def test_like_with_pattern_column(runner):
+    """ Patterns stored in a column are applied to their rows. """
+    columns = PART + [('P_PATTERN', nullable(varchar(8)))]
+    runner.write_table('part', [
+        [1, 'PROMO BRASS', 'PROMO%'], [2, 'a.b_c', 'a_b%'],
+        [3, 'axbyc', 'a.b%'], [4, None, '%'], [5, 'nut', None]])
+    condition = call('LIKE', [
+        ref(1, nullable(varchar(16))), ref(2, nullable(varchar(8)))],
+        syntax='SPECIAL')
+    result = runner.run(plan(
+        scan(0, 'PART', columns),
+        select(1, 0, columns, condition),
+        project(2, 1, [('P_PARTKEY', INTEGER)], [ref(0, INTEGER)])))
+    assert result == [[1], [2]]
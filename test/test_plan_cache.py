@@ -0,0 +1,53 @@
+'''
+Tests caching of query plans in memory and on disk.
+'''
+import dbz.plan
+import os
+
+PLAN = {'rels':[{'id':'0', 'relOp':'LogicalValues'}]}
+
+
+def make_cache(tmp_path, capacity=10):
+    """ Returns cache storing plans in temporary directory. """
+    schema_path = f'{tmp_path}/schema.sql'
+    if not os.path.exists(schema_path):
+        with open(schema_path, 'w') as file:
+            file.write('create table t(a int);')
+    return dbz.plan.PlanCache(schema_path, capacity, f'{tmp_path}/plans')
+
+
+def test_normalized_query_hits(tmp_path):
+    """ Queries differing in whitespace and case share plans. """
+    cache = make_cache(tmp_path)
+    cache.put('SELECT a\n FROM t;', PLAN)
+    assert cache.get('select a from t') == PLAN
+    assert cache.get("select a from t where a = 'X'") is None
+
+
+def test_plans_persist_on_disk(tmp_path):
+    """ Plans stored by one cache are found by another one. """
+    make_cache(tmp_path).put('select a from t', PLAN)
+    assert make_cache(tmp_path).get('select a from t') == PLAN
+
+
+def test_schema_change_drops_plans(tmp_path):
+    """ Plans are dropped if the schema file changes. """
+    cache = make_cache(tmp_path)
+    cache.put('select a from t', PLAN)
+    with open(f'{tmp_path}/schema.sql', 'w') as file:
+        file.write('create table t(a int, b int);')
+    assert cache.get('select a from t') is None
+    assert make_cache(tmp_path).get('select a from t') is None
+
+
+def test_eviction_keeps_other_files(tmp_path):
+    """ Capacity is enforced on plan files only. """
+    cache = make_cache(tmp_path, capacity=2)
+    other_path = f'{tmp_path}/plans/notes.txt'
+    with open(other_path, 'w') as file:
+        file.write('not a plan')
+    for a in range(5):
+        cache.put(f'select {a} from t', PLAN)
+    names = os.listdir(f'{tmp_path}/plans')
+    assert len([n for n in names if n.endswith('.json')]) == 2
+    assert os.path.exists(other_path)
@@ -0,0 +1,63 @@
+'''
+Tests rewrites of query plans before code generation.
+'''
+from plan_builder import *
+import dbz.rewrite
+
+PART = [
+    ('P_PARTKEY', INTEGER), ('P_NAME', varchar(8)),
+    ('P_SIZE', INTEGER), ('P_COMMENT', varchar(20))]
+ROWS = [
+    [1, 'bolt', 3, 'first'], [2, 'nut', 7, 'second'],
+    [3, 'screw', 9, 'third']]
+
+
+def project_name_plan():
+    """ Returns plan projecting names of parts larger than five. """
+    big = call('GREATER_THAN', [ref(2, INTEGER), lit(5, INTEGER)])
+    return plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, big),
+        project(2, 1, [PART[1]], [ref(1, varchar(8))]))
+
+
+def test_prune_columns():
+    """ Scans only load columns used by filters and projections. """
+    pruned = dbz.rewrite.prune_columns(project_name_plan())
+    scan_step, filter_step, project_step = pruned['rels']
+    assert scan_step['columns'] == [1, 2]
+    assert filter_step['condition']['operands'][0]['input'] == 1
+    assert project_step['exprs'] == [ref(0, varchar(8))]
+
+
+def test_pruned_plan_results(runner):
+    """ Pruning does not change query results. """
+    runner.write_table('part', ROWS)
+    assert runner.run(project_name_plan()) == [['nut'], ['screw']]
+
+
+def test_push_predicates():
+    """ Scans are annotated with ranges on stored column values. """
+    size = ref(2, INTEGER)
+    condition = call('AND', [
+        call('GREATER_THAN_OR_EQUAL', [size, lit(4, INTEGER)]),
+        call('LESS_THAN', [lit(8.5, decimal(2, 1)), size]),
+        call('LIKE', [ref(1, varchar(8)), lit('b%', varchar(2))])])
+    pushed = dbz.rewrite.push_predicates(plan(
+        scan(0, 'PART', PART), select(1, 0, PART, condition)))
+    assert pushed['rels'][0]['ranges'] == [[2, 4, None], [2, 8, None]]
+
+
+def test_zone_maps_keep_results(runner):
+    """ Filters on tables with skipped blocks return matching rows. """
+    # First block is skipped, others contain rows violating the filter
+    rows = [ROWS[0], ROWS[0], ROWS[1], ROWS[2], ROWS[2], ROWS[1]]
+    runner.write_table('part', rows, block_size=2)
+    condition = call('AND', [
+        call('GREATER_THAN', [ref(2, INTEGER), lit(5, INTEGER)]),
+        call('LESS_THAN', [ref(2, INTEGER), lit(8, INTEGER)])])
+    result = runner.run(plan(
+        scan(0, 'PART', PART),
+        select(1, 0, PART, condition),
+        project(2, 1, [PART[0]], [ref(0, INTEGER)])))
+    assert result == [[2], [2]]
@@ -0,0 +1,48 @@
+'''
+Tests sorting with and without limits on the number of result rows.
+'''
+from plan_builder import *
+import pytest
+
+LINEITEM = [('L_ORDERKEY', INTEGER), ('L_SHIPMODE', nullable(varchar(4)))]
+ROWS = [
+    [1, 'AIR'], [2, None], [3, 'SHIP'], [4, 'AIR'],
+    [5, 'MAIL'], [6, 'SHIP'], [7, None], [8, 'AIR']]
+
+
+def sort_plan(collation, fetch):
+    """ Returns plan sorting lineitem table. """
+    return plan(
+        scan(0, 'LINEITEM', LINEITEM),
+        sort(1, 0, LINEITEM, collation, fetch))
+
+
+@pytest.mark.parametrize('fetch', [None, 5])
+def test_sort_descending_nulls_last(runner, fetch):
+    """ Descending sort column is combined with ascending tie breaker. """
+    runner.write_table('lineitem', ROWS)
+    result = runner.run(sort_plan(
+        [(1, 'DESCENDING', 'LAST'), (0, 'ASCENDING', 'UNSPECIFIED')],
+        fetch))
+    expected = [
+        [3, 'SHIP'], [6, 'SHIP'], [5, 'MAIL'], [1, 'AIR'],
+        [4, 'AIR'], [8, 'AIR'], [2, None], [7, None]]
+    assert result == expected[:fetch]
+
+
+@pytest.mark.parametrize('fetch', [None, 3])
+def test_sort_nulls_first(runner, fetch):
+    """ NULL values come first if requested, ties keep row order. """
+    runner.write_table('lineitem', ROWS)
+    result = runner.run(sort_plan([(1, 'DESCENDING', 'FIRST')], fetch))
+    expected = [
+        [2, None], [7, None], [3, 'SHIP'], [6, 'SHIP'],
+        [5, 'MAIL'], [1, 'AIR'], [4, 'AIR'], [8, 'AIR']]
+    assert result == expected[:fetch]
+
+
+def test_top_n_descending_numbers(runner):
+    """ Limit keeps rows with largest keys. """
+    runner.write_table('lineitem', ROWS)
+    result = runner.run(sort_plan([(0, 'DESCENDING', 'UNSPECIFIED')], 2))
+    assert result == [[8, 'AIR'], [7, None]]
@@ -0,0 +1,73 @@
+'''
+Tests binary columnar storage of tables.
+'''
+import dbz.include.storage as storage
+import json
+import os
+import plan_runner
+import pytest
+import subprocess
+import sys
+
+NR_ROWS = 16
+COLUMNS = [
+    [i * 2**36 - 5 for i in range(NR_ROWS)],
+    [None if i % 5 == 0 else i / 4 for i in range(NR_ROWS)],
+    [None if i == 3 else f'näme {i}' for i in range(NR_ROWS)],
+    [[None, 'AIR', 'MAIL', 'AIR'][i % 4] for i in range(NR_ROWS)]]
+
+
+@pytest.mark.parametrize('mapped', [True, False])
+def test_round_trip(tmp_path, mapped):
+    """ Loaded columns contain written values, including NULL values. """
+    storage.write_binary(COLUMNS, f'{tmp_path}/t')
+    with open(f'{tmp_path}/t/meta.json') as file:
+        meta = json.load(file)
+    kinds = [c['kind'] for c in meta['columns']]
+    assert kinds == ['int', 'float', 'str', 'dict']
+    loaded = storage.load_binary(f'{tmp_path}/t', mapped=mapped)
+    assert [list(c) for c in loaded] == COLUMNS
+
+
+def test_load_column_subset(tmp_path):
+    """ Only requested columns are loaded, in requested order. """
+    storage.write_binary(COLUMNS, f'{tmp_path}/t')
+    loaded = storage.load_binary(f'{tmp_path}/t', [2, 0])
+    assert [list(c) for c in loaded] == [COLUMNS[2], COLUMNS[0]]
+
+
+def test_convert_csv_files(tmp_path):
+    """ Integer columns with NULL values are stored as integers. """
+    with open(f'{tmp_path}/part.csv', 'w') as file:
+        file.write('1,bolt,2.5\n,nut,\n3,,1.5\n')
+    subprocess.run(
+        [sys.executable, 'src/dbz/prep/csv_to_bin.py', str(tmp_path)],
+        cwd=plan_runner.REPO_DIR, check=True, capture_output=True,
+        env={**os.environ, 'PYTHONPATH':f'{plan_runner.REPO_DIR}/src'})
+    with open(f'{tmp_path}/part/meta.json') as file:
+        meta = json.load(file)
+    assert [c['kind'] for c in meta['columns']] == ['int', 'str', 'float']
+    loaded = storage.load_binary(f'{tmp_path}/part')
+    assert [list(c) for c in loaded] == [
+        [1, None, 3], ['bolt', 'nut', None], [2.5, None, 1.5]]
+
+
+def test_map_fixed_width_columns(tmp_path):
+    """ Fixed-width columns without NULL values are mapped read-only. """
+    storage.write_binary(COLUMNS, f'{tmp_path}/t')
+    loaded = storage.load_binary(f'{tmp_path}/t')
+    assert isinstance(loaded[0], memoryview) and loaded[0].readonly
+    assert isinstance(loaded[3].codes, memoryview)
+    assert isinstance(loaded[1], list)
+    with pytest.raises(TypeError):
+        loaded[0][0] = 1
+
+
+def test_skip_blocks_outside_ranges(tmp_path):
+    """ Blocks whose zone maps exclude range predicates are skipped. """
+    storage.write_binary(COLUMNS, f'{tmp_path}/t', block_size=4)
+    assert storage.block_runs(f'{tmp_path}/t', [[0, None, 16 * 2**36]]) is None
+    ranges = [[1, 1.2, 2.5], [0, 5 * 2**36, None]]
+    assert storage.block_runs(f'{tmp_path}/t', ranges) == [(4, 12)]
+    loaded = storage.load_binary(f'{tmp_path}/t', [2, 0], ranges=ranges)
+    assert [list(c) for c in loaded] == [COLUMNS[2][4:12], COLUMNS[0][4:12]]
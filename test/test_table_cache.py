@@ -0,0 +1,26 @@
+'''
+Tests sharing of cached table columns across queries.
+'''
+from plan_builder import *
+
+PART = [('P_PARTKEY', INTEGER), ('P_NAME', varchar(8))]
+ROWS = [[1, 'alpha'], [2, 'beta'], [3, 'gamma'], [4, 'delta']]
+
+
+def test_in_place_operators_keep_cached_columns(runner):
+    """ Operators modifying their input do not change cached columns. """
+    runner.write_table('part', ROWS)
+    prefix = call(
+        'SUBSTRING', [ref(1, varchar(8)), lit(1, INTEGER), lit(2, INTEGER)],
+        varchar(2), syntax='FUNCTION')
+    as_float = call(
+        'CAST', [ref(0, INTEGER)], {'type':'FLOAT', 'nullable':False},
+        syntax='SPECIAL')
+    output = [('P', varchar(2)), ('F', {'type':'FLOAT', 'nullable':False})]
+    prefix_plan = plan(
+        scan(0, 'PART', PART),
+        project(1, 0, output, [prefix, as_float]))
+    for _ in range(2):
+        result = runner.run(prefix_plan)
+        assert result == [['al', 1], ['be', 2], ['ga', 3], ['de', 4]]
+    assert runner.run(plan(scan(0, 'PART', PART))) == ROWS